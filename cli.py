@@ -4,168 +4,280 @@ Simula la experiencia de un router profesional con diferentes modos
 """
 from network import Network
 from commands import *
+from functools import lru_cache
+import re
 import shlex
+import sys
+
+# Patrones de validación precompilados una sola vez al cargar el módulo
+_IP_RE = re.compile(r'^(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)$')
+_HOSTNAME_RE = re.compile(r'^[a-zA-Z0-9](?:[a-zA-Z0-9\-_]*[a-zA-Z0-9])?$')
+_INTERFACE_RE = re.compile(r'^(?:g\d+/\d+|eth\d+|f\d+/\d+|s\d+/\d+)$')
+
+# Normalizaciones de los primeros tokens de comandos compuestos, indexadas
+# por (comando, subcomando) para resolverlas con una sola búsqueda en vez
+# de una cadena de if/elif con comparaciones de strings repetidas
+_REWRITES = {
+    ("configure", "terminal"): lambda args, largs: ("configure", ["terminal"]),
+    ("ip", "address"): lambda args, largs: ("ip", ["address"] + args[1:]),
+    ("ip", "route"): lambda args, largs: ("ip", ["route"] + args[1:]),
+    ("no", "shutdown"): lambda args, largs: ("no", ["shutdown"]),
+    ("save", "running-config"): lambda args, largs: ("save", ["running-config"] + args[1:]),
+    ("save", "snapshot"): lambda args, largs: ("save", ["snapshot"] + args[1:]),
+    ("load", "config"): lambda args, largs: ("load", ["config"] + args[1:]),
+    ("show", "ip"): lambda args, largs: ("show", ["ip", "route-tree"])
+                    if len(largs) >= 2 and largs[1] == "route-tree"
+                    else ("show", args),
+    ("btree", "stats"): lambda args, largs: ("btree", ["stats"]),
+}
+
+@lru_cache(maxsize=256)
+def _parse_line(command_line):
+    """Tokeniza y reescribe una línea ya sin espacios en los extremos
+
+    Memoizada: el uso interactivo repite las mismas líneas (flecha
+    arriba, tick, show ...), así que los resultados se cachean por línea
+    exacta. Retorna (comando, tupla de argumentos) para que el valor
+    cacheado sea inmutable.
+    """
+    try:
+        # Solo usar shlex cuando hay comillas o escapes; la mayoría de
+        # las líneas del CLI son tokens simples y str.split basta
+        if "'" not in command_line and '"' not in command_line and "\\" not in command_line:
+            parts = command_line.split()
+        else:
+            parts = shlex.split(command_line)
+        if not parts:
+            return None, ()
+
+        command = sys.intern(parts[0].lower())
+        args = parts[1:]
+
+        # Manejar comandos compuestos con la tabla de reescrituras;
+        # solo los primeros tokens deciden la reescritura, así que se
+        # pasan a minúsculas una sola vez (args conserva el caso
+        # original para IPs, nombres de host, etc.)
+        if args:
+            largs = [a.lower() for a in args[:3]]
+            rewrite = _REWRITES.get((command, largs[0]))
+            if rewrite:
+                command, args = rewrite(args, largs)
+
+        return command, tuple(args)
+
+    except ValueError as e:
+        return None, (str(e),)
+
+# Plantillas de error reutilizadas en la ruta de fallo de execute_command
+_UNKNOWN_FMT = "Error: Unknown command '%s' in %s mode"
+_EXEC_ERROR_FMT = "Command execution error: %s"
+
+# Resultados constantes compartidos; evita construir la misma tupla en
+# cada Enter vacío o salida del CLI
+_OK_EMPTY = (True, "")
+_GOODBYE = (True, "Goodbye!")
+
+# Constructor del prompt por modo: la rama por modo se resuelve al
+# cambiar de modo, no en cada get_prompt
+_PROMPT_BUILDERS = {
+    "user": lambda device: device.name + "> ",
+    "privileged": lambda device: device.name + "# ",
+    "config": lambda device: device.name + "(config)# ",
+    "config-if": lambda device: device.name + "(config-if)# "
+}
+_DEFAULT_PROMPT_BUILDER = _PROMPT_BUILDERS["user"]
 
 class CLIContext:
     """Contexto del CLI que mantiene el estado actual"""
-    
+
+    # Registro de comandos compartido entre todos los contextos; se
+    # construye una sola vez en el primer uso (los comandos no tienen
+    # estado, así que es seguro compartirlo)
+    _COMMANDS = None
+    # Por modo, los mismos comandos agrupados por longitud del nombre:
+    # _COMMANDS_BY_LEN[modo][len(nombre)][nombre] -> handler. Dispersar
+    # primero por longitud deja 1-3 entradas por cubeta, así que la
+    # sonda del diccionario casi siempre resuelve en un solo slot
+    _COMMANDS_BY_LEN = None
+
     def __init__(self, network):
         self.network = network
         self.current_device = None
-        self.current_mode = "user"  # user, privileged, config, config-if
+        self._current_mode = MODE_USER  # user, privileged, config, config-if
         self.current_interface = None
+        # Objeto Interface activo en modo config-if; lo fija
+        # InterfaceCommand y lo limpian exit/end
+        self.current_interface_obj = None
         self.running = True
-        
-        # Registro de comandos por modo
-        self.commands = {
+        self._prompt_builder = _PROMPT_BUILDERS[self._current_mode]
+
+        cls = type(self)
+        self.commands = cls._COMMANDS if cls._COMMANDS is not None else cls._build_commands()
+        # Tablas activas cacheadas; se actualizan solo al cambiar de modo
+        self._cmd_table = self.commands[self._current_mode]
+        self._cmd_by_len = cls._COMMANDS_BY_LEN[self._current_mode]
+
+    @classmethod
+    def _build_commands(cls):
+        """Construye el registro de comandos por modo (una vez por proceso)"""
+        # Los comandos son sin estado: las tablas por modo comparten las
+        # instancias únicas del COMMAND_REGISTRY de commands.py. Las clases
+        # declaran __slots__ = () (sin __dict__ por instancia), así que
+        # cualquier estado debe viajar en el cli_context de execute
+        reg = COMMAND_REGISTRY
+        enable = reg["enable"]
+        send = reg["send"]
+        console = reg["console"]
+        tick = reg["tick"]
+        show = reg["show"]
+        list_devices = reg["list_devices"]
+        help_cmd = reg["help"]
+        exit_cmd = reg["exit"]
+        end = reg["end"]
+        ip = reg["ip"]
+
+        commands = {
             "user": {
-                "enable": EnableCommand(),
-                "send": SendCommand(),
-                "console": ConsoleCommand(),
-                "tick": TickCommand(),
-                "process": TickCommand(),
-                "show": ShowCommand(),
-                "list_devices": ListDevicesCommand(),
-                "help": HelpCommand(),
-                "exit": ExitCommand()
+                "enable": enable,
+                "send": send,
+                "console": console,
+                "tick": tick,
+                "process": tick,
+                "show": show,
+                "list_devices": list_devices,
+                "help": help_cmd,
+                "exit": exit_cmd
             },
             "privileged": {
-                "enable": EnableCommand(),  # Permitir enable en modo privilegiado
-                "disable": DisableCommand(),
-                "configure": ConfigureTerminalCommand(),
-                "connect": ConnectCommand(),
-                "disconnect": DisconnectCommand(),
-                "set_device_status": SetDeviceStatusCommand(),
-                "list_devices": ListDevicesCommand(),
-                "add": AddDeviceCommand(),
-                "send": SendCommand(),
-                "show": ShowCommand(),
-                "save": SaveSnapshotCommand(),
-                "load": LoadConfigCommand(),
-                "btree": BtreeStatsCommand(),
-                "tick": TickCommand(),
-                "process": TickCommand(),
-                "console": ConsoleCommand(),
-                "help": HelpCommand(),
-                "exit": ExitCommand()
+                "enable": enable,  # Permitir enable en modo privilegiado
+                "disable": reg["disable"],
+                "configure": reg["configure"],
+                "connect": reg["connect"],
+                "disconnect": reg["disconnect"],
+                "set_device_status": reg["set_device_status"],
+                "list_devices": list_devices,
+                "add": reg["add"],
+                "send": send,
+                "show": show,
+                "save": reg["save"],
+                "load": reg["load"],
+                "btree": reg["btree"],
+                "tick": tick,
+                "process": tick,
+                "console": console,
+                "help": help_cmd,
+                "exit": exit_cmd
             },
             "config": {
-                "hostname": HostnameCommand(),
-                "interface": InterfaceCommand(),
-                "ip": IpCommand(),
-                "policy": PolicyCommand(),
-                "exit": ExitCommand(),
-                "end": EndCommand(),
-                "help": HelpCommand()
+                "hostname": reg["hostname"],
+                "interface": reg["interface"],
+                "ip": ip,
+                "policy": reg["policy"],
+                "exit": exit_cmd,
+                "end": end,
+                "help": help_cmd
             },
             "config-if": {
-                "ip": IpCommand(),
-                "shutdown": ShutdownCommand(),
-                "no": NoShutdownCommand(),
-                "exit": ExitCommand(),
-                "end": EndCommand(),
-                "help": HelpCommand()
+                "ip": ip,
+                "shutdown": reg["shutdown"],
+                "no": reg["no"],
+                "exit": exit_cmd,
+                "end": end,
+                "help": help_cmd
             }
         }
-    
+
+        # Internar las claves para que la búsqueda en el diccionario se
+        # resuelva por identidad de punteros en el caso común
+        cls._COMMANDS = {
+            mode: {sys.intern(name): handler for name, handler in table.items()}
+            for mode, table in commands.items()
+        }
+
+        # Cubetas por longitud de nombre para cada modo. Guardan el método
+        # execute ya ligado, así la ruta caliente llama directo sin el
+        # LOAD_ATTR de handler.execute por comando
+        max_len = max(len(name) for table in cls._COMMANDS.values() for name in table)
+        by_len = {}
+        for mode, table in cls._COMMANDS.items():
+            buckets = [{} for _ in range(max_len + 1)]
+            for name, handler in table.items():
+                buckets[len(name)][name] = handler.execute
+            by_len[mode] = buckets
+        cls._COMMANDS_BY_LEN = by_len
+
+        return cls._COMMANDS
+
+    @property
+    def current_mode(self):
+        return self._current_mode
+
+    @current_mode.setter
+    def current_mode(self, mode):
+        self.set_mode(mode)
+
+    def set_mode(self, mode):
+        """Cambia el modo actual y actualiza las tablas de comandos activas
+
+        Interna el modo para que las comparaciones por identidad de los
+        comandos (mode is MODE_CFG_IF) sean válidas venga de donde venga.
+        """
+        self._current_mode = sys.intern(mode)
+        self._cmd_table = self.commands.get(mode, {})
+        self._cmd_by_len = type(self)._COMMANDS_BY_LEN.get(mode, [])
+        self._prompt_builder = _PROMPT_BUILDERS.get(mode, _DEFAULT_PROMPT_BUILDER)
+
     def get_prompt(self):
         """Genera el prompt basado en el modo actual"""
-        if not self.current_device:
+        device = self.current_device
+        if device is None:
             return "Router-Simulator> "
-        
-        device_name = self.current_device.name
-        
-        if self.current_mode == "user":
-            return f"{device_name}> "
-        elif self.current_mode == "privileged":
-            return f"{device_name}# "
-        elif self.current_mode == "config":
-            return f"{device_name}(config)# "
-        elif self.current_mode == "config-if":
-            return f"{device_name}(config-if)# "
-        
-        return f"{device_name}> "
+        return self._prompt_builder(device)
     
     def get_available_commands(self):
         """Retorna los comandos disponibles en el modo actual"""
-        return self.commands.get(self.current_mode, {})
+        return self._cmd_table
     
     def parse_command(self, command_line):
         """Parsea una línea de comando y retorna comando y argumentos"""
-        try:
-            # Usar shlex para manejar comillas correctamente
-            parts = shlex.split(command_line.strip())
-            if not parts:
-                return None, []
-            
-            command = parts[0].lower()
-            args = parts[1:]
-            
-            # Manejar comandos especiales
-            if command == "configure" and len(args) >= 1 and args[0].lower() == "terminal":
-                return "configure", ["terminal"]
-            elif command == "ip" and len(args) >= 2 and args[0].lower() == "address":
-                return "ip", ["address"] + args[1:]
-            elif command == "no" and len(args) >= 1:
-                # Manejar "no shutdown", "no ip", etc.
-                if args[0].lower() == "shutdown":
-                    return "no", ["shutdown"]
-            elif command == "save" and len(args) >= 1:
-                if args[0].lower() == "running-config":
-                    return "save", ["running-config"] + args[1:]
-                elif args[0].lower() == "snapshot":
-                    return "save", ["snapshot"] + args[1:]
-            elif command == "load" and len(args) >= 2 and args[0].lower() == "config":
-                return "load", ["config"] + args[1:]
-            elif command == "ip" and len(args) >= 1:
-                if len(args) >= 2 and args[0].lower() == "route":
-                    return "ip", ["route"] + args[1:]
-                elif len(args) >= 2 and args[0].lower() == "address":
-                    return "ip", ["address"] + args[1:]
-                else:
-                    return "ip", args
-            elif command == "show" and len(args) >= 2 and args[0].lower() == "ip" and args[1].lower() == "route-tree":
-                return "show", ["ip", "route-tree"]
-            elif command == "policy" and len(args) >= 1:
-                return "policy", args
-            elif command == "btree" and len(args) >= 1 and args[0].lower() == "stats":
-                return "btree", ["stats"]
-            elif command == "add" and len(args) >= 1:
-                return "add", args
-            
-            return command, args
-            
-        except ValueError as e:
-            return None, [str(e)]
+        command, args = _parse_line(command_line.strip())
+        return command, list(args)
     
     def execute_command(self, command_line):
         """Ejecuta una línea de comando completa"""
-        if not command_line.strip():
-            return True, ""
-        
+        command_line = command_line.strip()
+        if not command_line:
+            return _OK_EMPTY
+
         command, args = self.parse_command(command_line)
-        
+
         if command is None:
-            return False, f"Invalid command syntax: {args[0] if args else 'empty command'}"
-        
+            return False, "Error: Invalid command syntax: " + (args[0] if args else "empty command")
+
         # Comando especial para salir
-        if command == "quit" or (command == "exit" and self.current_mode == "user"):
+        if command == "quit" or (command == "exit" and self._current_mode == "user"):
             self.running = False
-            return True, "Goodbye!"
-        
-        available_commands = self.get_available_commands()
-        
-        if command not in available_commands:
-            return False, f"Unknown command '{command}' in {self.current_mode} mode"
-        
+            return _GOODBYE
+
+        by_len = self._cmd_by_len
+        n = len(command)
+        execute = by_len[n].get(command) if n < len(by_len) else None
+        if execute is None:
+            return False, _UNKNOWN_FMT % (command, self._current_mode)
+
         try:
-            command_obj = available_commands[command]
-            return command_obj.execute(self, args)
+            success, message = execute(self, args)
         except Exception as e:
             # Registrar error en el log
             if self.current_device:
                 self.current_device.error_log.log_error("CommandError", str(e), command_line)
-            return False, f"Command execution error: {str(e)}"
+            return False, "Error: " + (_EXEC_ERROR_FMT % e)
+
+        # Los mensajes de fallo salen ya prefijados para que el bucle
+        # interactivo sea un único print sin formateo adicional
+        if not success and message:
+            return False, "Error: " + message
+        return success, message
 
 class RouterCLI:
     """Interfaz principal del CLI del simulador"""
@@ -178,36 +290,26 @@ class RouterCLI:
     
     def _setup_default_network(self):
         """Configura una red de prueba por defecto"""
-        # Crear dispositivos por defecto
-        self.network.add_device("Router1", "router")
-        self.network.add_device("Switch1", "switch")
-        self.network.add_device("PC1", "host")
-        self.network.add_device("PC2", "host")
-        
-        # Configurar Router1
-        router1 = self.network.get_device("Router1")
+        # add_device/add_interface retornan el objeto creado, así que no
+        # hace falta volver a buscarlo en los diccionarios
+        router1 = self.network.add_device("Router1", "router")
         router1.add_interface("g0/0")
         router1.add_interface("g0/1")
-        
-        # Configurar Switch1
-        switch1 = self.network.get_device("Switch1")
+
+        switch1 = self.network.add_device("Switch1", "switch")
         switch1.add_interface("g0/1")
         switch1.add_interface("g0/2")
-        
-        # Configurar PC1
-        pc1 = self.network.get_device("PC1")
-        pc1.add_interface("eth0")
-        pc1_eth0 = pc1.get_interface("eth0")
+
+        pc1 = self.network.add_device("PC1", "host")
+        pc1_eth0 = pc1.add_interface("eth0")
         pc1_eth0.set_ip_address("10.0.0.1")
         pc1_eth0.no_shutdown()
-        
-        # Configurar PC2
-        pc2 = self.network.get_device("PC2")
-        pc2.add_interface("eth0")
-        pc2_eth0 = pc2.get_interface("eth0")
+
+        pc2 = self.network.add_device("PC2", "host")
+        pc2_eth0 = pc2.add_interface("eth0")
         pc2_eth0.set_ip_address("10.0.0.2")
         pc2_eth0.no_shutdown()
-        
+
         # Establecer dispositivo actual
         self.context.current_device = router1
     
@@ -218,64 +320,64 @@ class RouterCLI:
         print("Default network loaded with Router1, Switch1, PC1, PC2")
         print()
         
-        while self.context.running:
+        # Enlazar métodos y builtins a locales fuera del bucle para
+        # ahorrar resoluciones de atributos en cada iteración. Se lee y
+        # escribe directo sobre stdin/stdout: input()/print() añaden
+        # manejo de readline, locks y separadores que aquí no hacen falta
+        context = self.context
+        get_prompt = context.get_prompt
+        execute = context.execute_command
+        write = sys.stdout.write
+        flush = sys.stdout.flush
+        readline = sys.stdin.readline
+
+        while context.running:
             try:
-                prompt = self.context.get_prompt()
-                command_line = input(prompt)
-                
-                success, message = self.context.execute_command(command_line)
-                
+                write(get_prompt())
+                flush()
+                line = readline()
+                if not line:  # EOF
+                    break
+
+                success, message = execute(line)
+
                 if message:
-                    if success:
-                        print(message)
-                    else:
-                        print(f"Error: {message}")
-                
+                    write(message + "\n")
+
             except KeyboardInterrupt:
-                print("\nUse 'quit' to exit")
-            except EOFError:
-                break
+                write("\nUse 'quit' to exit\n")
             except Exception as e:
-                print(f"Unexpected error: {e}")
-    
+                write(f"Unexpected error: {e}\n")
+
     def execute_script(self, commands):
-        """Ejecuta una lista de comandos (para testing)"""
-        results = []
+        """Ejecuta una lista de comandos y va generando los resultados (para testing)
+
+        Retorna un generador de tuplas (comando, éxito, mensaje); envolver
+        con list() si se necesita la lista completa.
+        """
+        execute = self.context.execute_command
         for command in commands:
-            success, message = self.context.execute_command(command)
-            results.append((command, success, message))
-        return results
+            success, message = execute(command)
+            yield command, success, message
 
 def validate_input(input_str, validation_type):
     """Función de utilidad para validar diferentes tipos de entrada"""
     
     if validation_type == "ip":
-        pattern = r'^(\d{1,3}\.){3}\d{1,3}$'
-        if not re.match(pattern, input_str):
+        # El rango 0-255 de cada octeto está incorporado al patrón
+        if not _IP_RE.match(input_str):
             return False, "Invalid IP address format"
-        
-        parts = input_str.split('.')
-        for part in parts:
-            if not (0 <= int(part) <= 255):
-                return False, "IP address octets must be between 0-255"
         return True, None
-    
+
     elif validation_type == "hostname":
-        pattern = r'^[a-zA-Z0-9][a-zA-Z0-9\-_]*[a-zA-Z0-9]$|^[a-zA-Z0-9]$'
-        if not re.match(pattern, input_str):
+        if not _HOSTNAME_RE.match(input_str):
             return False, "Invalid hostname format"
         if len(input_str) > 64:
             return False, "Hostname too long (max 64 characters)"
         return True, None
-    
+
     elif validation_type == "interface":
-        patterns = [
-            r'^g\d+/\d+$',  # GigabitEthernet
-            r'^eth\d+$',    # Ethernet
-            r'^f\d+/\d+$',  # FastEthernet
-            r'^s\d+/\d+$'   # Serial
-        ]
-        if any(re.match(pattern, input_str) for pattern in patterns):
+        if _INTERFACE_RE.match(input_str):
             return True, None
         return False, "Invalid interface name format"
     
@@ -2,10 +2,92 @@
 Implementación del patrón Command para los comandos del CLI
 """
 from abc import ABC, abstractmethod
+from functools import wraps
+import ipaddress
 import re
+import sys
+
+# Modos del CLI internados una sola vez: todas las transiciones asignan
+# estas constantes, así que las comparaciones de modo se resuelven por
+# identidad de puntero ("config-if" no es auto-internada por el compilador)
+MODE_USER = sys.intern("user")
+MODE_PRIV = sys.intern("privileged")
+MODE_CFG = sys.intern("config")
+MODE_CFG_IF = sys.intern("config-if")
+
+# Patrones de validación compilados una sola vez al cargar el módulo.
+# El límite de 64 caracteres del hostname va incorporado al cuantificador
+# {0,62}, y la alternancia de interfaces reemplaza cuatro patrones sueltos
+# Patrones sin anclas: se evalúan con fullmatch, que ya implica inicio y
+# fin y permite al motor rechazar por longitud antes de escanear
+_HOSTNAME_RE = re.compile(r'[a-zA-Z0-9](?:[a-zA-Z0-9\-_]{0,62}[a-zA-Z0-9])?')
+_IFACE_RE = re.compile(r'g\d+/\d+|eth\d+|f\d+/\d+|s\d+/\d+')
+# Primer carácter posible de un nombre de interfaz válido; despacho por
+# primer byte antes de arrancar el motor de regex
+_IFACE_FIRST = frozenset('gefs')
+
+# Tabla precalculada máscara punteada -> prefijo CIDR para las 33 máscaras
+# válidas; convierte la conversión por comando en una sola búsqueda hash
+_MASK_TO_CIDR = {
+    str(ipaddress.IPv4Address((0xFFFFFFFF << (32 - p)) & 0xFFFFFFFF if p else 0)): p
+    for p in range(33)
+}
+
+def _mask_to_cidr(mask):
+    """Convierte máscara punteada a notación CIDR"""
+    cidr = _MASK_TO_CIDR.get(mask)
+    if cidr is not None:
+        return cidr
+    # Máscara no canónica: contar bits con int.bit_count (POPCNT nativo,
+    # sin materializar la cadena intermedia de bin())
+    try:
+        return sum(int(octet).bit_count() for octet in mask.split('.'))
+    except ValueError:
+        return 0
+
+# Etiquetas legibles por modo para el mensaje de error del guard
+_MODE_LABELS = {
+    MODE_PRIV: "privileged",
+    MODE_CFG: "configuration",
+    MODE_CFG_IF: "interface configuration",
+}
+
+def requires_mode(*modes):
+    """Decorador que exige uno de los modos dados antes de ejecutar
+
+    El frozenset y el mensaje de error se construyen una sola vez al
+    decorar, así el guard repetido en cada execute queda en una
+    pertenencia a conjunto y sin tuplas nuevas en la ruta de rechazo.
+    """
+    allowed = frozenset(modes)
+    error = (False, f"Must be in {_MODE_LABELS.get(modes[0], modes[0])} mode")
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, cli_context, args):
+            if cli_context.current_mode not in allowed:
+                return error
+            return func(self, cli_context, args)
+        return wrapper
+    return decorator
+
+
 
 class Command(ABC):
     """Clase base abstracta para todos los comandos"""
+    __slots__ = ()
+    
+    # Aridad exacta que espera execute; None desactiva la comprobación.
+    # Las subclases que la declaran validan con una sola comparación
+    # compartida en vez de repetir el guard len(args) != N
+    EXPECTED_ARGC = None
+    USAGE = None
+    
+    def _check_argc(self, args):
+        """Valida la aridad de args; retorna el error de uso o None"""
+        expected = self.EXPECTED_ARGC
+        if expected is not None and len(args) != expected:
+            return False, self.USAGE
+        return None
     
     @abstractmethod
     def execute(self, cli_context, args):
@@ -19,197 +101,251 @@ class Command(ABC):
 
 class EnableCommand(Command):
     """Comando enable - cambia a modo privilegiado"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
-        if cli_context.current_mode == "user":
-            cli_context.current_mode = "privileged"
+        if cli_context.current_mode is MODE_USER:
+            cli_context.current_mode = MODE_PRIV
             return True, None
         return False, "Already in privileged mode"
     
+    HELP = "enable - Enter privileged mode"
+    
     def get_help(self):
-        return "enable - Enter privileged mode"
+        return self.HELP
 
 class DisableCommand(Command):
     """Comando disable - regresa a modo usuario"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
-        if cli_context.current_mode != "user":
-            cli_context.current_mode = "user"
+        if cli_context.current_mode is not MODE_USER:
+            cli_context.current_mode = MODE_USER
             return True, None
         return False, "Already in user mode"
     
+    HELP = "disable - Return to user mode"
+    
     def get_help(self):
-        return "disable - Return to user mode"
+        return self.HELP
 
 class ConfigureTerminalCommand(Command):
     """Comando configure terminal - entra a modo configuración global"""
+    __slots__ = ()
     
+    @requires_mode(MODE_PRIV)
     def execute(self, cli_context, args):
-        if cli_context.current_mode == "privileged":
-            cli_context.current_mode = "config"
-            return True, None
-        return False, "Must be in privileged mode"
+        cli_context.current_mode = MODE_CFG
+        return True, None
+    
+    HELP = "configure terminal - Enter global configuration mode"
     
     def get_help(self):
-        return "configure terminal - Enter global configuration mode"
+        return self.HELP
 
 class HostnameCommand(Command):
     """Comando hostname - cambia el nombre del dispositivo"""
+    __slots__ = ()
     
+    EXPECTED_ARGC = 1
+    USAGE = "Usage: hostname <device_name>"
+    
+    @requires_mode(MODE_CFG)
     def execute(self, cli_context, args):
-        if cli_context.current_mode != "config":
-            return False, "Must be in configuration mode"
-        
-        if len(args) != 1:
-            return False, "Usage: hostname <device_name>"
+        err = self._check_argc(args)
+        if err:
+            return err
         
         new_name = args[0]
         if not self._validate_hostname(new_name):
             return False, "Invalid hostname format"
         
-        old_name = cli_context.current_device.name
-        cli_context.current_device.name = new_name
+        device = cli_context.current_device
+        old_name = device.name
+        device.name = new_name
         
         # Actualizar en la red
         cli_context.network.devices[new_name] = cli_context.network.devices.pop(old_name)
+        cli_context.network._topology_version += 1
+        
+        # Los vecinos muestran este nombre en su vista de interfaces
+        # cacheada; invalidarla para que el próximo show lo reconstruya
+        for interface in device.interfaces.values():
+            for neighbor_if in interface.connected_interfaces:
+                neighbor_if.device._status_dirty = True
         
         return True, f"Hostname changed to {new_name}"
     
     def _validate_hostname(self, hostname):
-        """Valida el formato del hostname"""
-        pattern = r'^[a-zA-Z0-9][a-zA-Z0-9\-_]*[a-zA-Z0-9]$|^[a-zA-Z0-9]$'
-        return re.match(pattern, hostname) and len(hostname) <= 64
+        """Valida el formato del hostname (longitud máxima incluida en el patrón)"""
+        # Pre-filtro barato antes del regex
+        if not hostname or len(hostname) > 64:
+            return False
+        return _HOSTNAME_RE.fullmatch(hostname) is not None
+    
+    HELP = "hostname <name> - Set device hostname"
     
     def get_help(self):
-        return "hostname <name> - Set device hostname"
+        return self.HELP
 
 class InterfaceCommand(Command):
     """Comando interface - entra al modo configuración de interfaz"""
+    __slots__ = ()
+    
+    EXPECTED_ARGC = 1
+    USAGE = "Usage: interface <interface_name>"
     
+    @requires_mode(MODE_CFG)
     def execute(self, cli_context, args):
-        if cli_context.current_mode != "config":
-            return False, "Must be in configuration mode"
-        
-        if len(args) != 1:
-            return False, "Usage: interface <interface_name>"
+        err = self._check_argc(args)
+        if err:
+            return err
         
         interface_name = args[0]
         if not self._validate_interface_name(interface_name):
             return False, "Invalid interface name format"
         
-        # Crear interfaz si no existe
-        cli_context.current_device.add_interface(interface_name)
+        # Crear interfaz si no existe y cachear el objeto en el contexto
+        # para que los comandos de modo config-if no repitan el lookup
+        device = cli_context.current_device
+        interface = device.add_interface(interface_name)
+        if interface is None:
+            interface = device.get_interface(interface_name)
+        else:
+            cli_context.network._topology_version += 1
         
-        cli_context.current_mode = "config-if"
+        cli_context.current_mode = MODE_CFG_IF
         cli_context.current_interface = interface_name
+        cli_context.current_interface_obj = interface
         
         return True, f"Entered interface {interface_name} configuration"
     
     def _validate_interface_name(self, interface_name):
-        """Valida el formato del nombre de interfaz"""
-        patterns = [
-            r'^g\d+/\d+$',  # GigabitEthernet (g0/0, g1/1, etc.)
-            r'^eth\d+$',    # Ethernet (eth0, eth1, etc.)
-            r'^f\d+/\d+$',  # FastEthernet (f0/0, f1/1, etc.)
-            r'^s\d+/\d+$'   # Serial (s0/0, s1/1, etc.)
-        ]
-        return any(re.match(pattern, interface_name) for pattern in patterns)
+        """Valida el formato del nombre de interfaz (g0/0, eth0, f0/0, s0/0)"""
+        # Pre-filtro barato: todas las familias válidas miden >= 4 y
+        # empiezan por g/e/f/s
+        if len(interface_name) < 4 or interface_name[0] not in _IFACE_FIRST:
+            return False
+        return _IFACE_RE.fullmatch(interface_name) is not None
+    
+    HELP = "interface <name> - Enter interface configuration mode"
     
     def get_help(self):
-        return "interface <name> - Enter interface configuration mode"
+        return self.HELP
 
 class IpAddressCommand(Command):
     """Comando ip address - asigna IP a una interfaz"""
+    __slots__ = ()
     
+    @requires_mode(MODE_CFG_IF)
     def execute(self, cli_context, args):
-        if cli_context.current_mode != "config-if":
-            return False, "Must be in interface configuration mode"
-        
         if len(args) < 2 or args[0].lower() != "address":
             return False, "Usage: ip address <ip_address>"
         
         ip_address = args[1]
-        interface = cli_context.current_device.get_interface(cli_context.current_interface)
+        interface = cli_context.current_interface_obj
         
         if interface.set_ip_address(ip_address):
+            cli_context.current_device._source_ip_cache = None
+            cli_context.network._topology_version += 1
             return True, f"IP address {ip_address} configured"
         return False, "Invalid IP address format"
     
+    HELP = "ip address <ip> - Set interface IP address"
+    
     def get_help(self):
-        return "ip address <ip> - Set interface IP address"
+        return self.HELP
 
 class ShutdownCommand(Command):
     """Comando shutdown - desactiva una interfaz"""
+    __slots__ = ()
     
+    @requires_mode(MODE_CFG_IF)
     def execute(self, cli_context, args):
-        if cli_context.current_mode != "config-if":
-            return False, "Must be in interface configuration mode"
-        
-        interface = cli_context.current_device.get_interface(cli_context.current_interface)
+        interface = cli_context.current_interface_obj
         interface.shutdown()
+        cli_context.current_device._source_ip_cache = None
+        cli_context.network._topology_version += 1
         
         return True, f"Interface {cli_context.current_interface} shutdown"
     
+    HELP = "shutdown - Disable interface"
+    
     def get_help(self):
-        return "shutdown - Disable interface"
+        return self.HELP
 
 class NoShutdownCommand(Command):
     """Comando no shutdown - activa una interfaz"""
+    __slots__ = ()
     
+    @requires_mode(MODE_CFG_IF)
     def execute(self, cli_context, args):
-        if cli_context.current_mode != "config-if":
-            return False, "Must be in interface configuration mode"
-        
-        interface = cli_context.current_device.get_interface(cli_context.current_interface)
+        interface = cli_context.current_interface_obj
         interface.no_shutdown()
+        cli_context.current_device._source_ip_cache = None
+        cli_context.network._topology_version += 1
         
         return True, f"Interface {cli_context.current_interface} is up"
     
+    HELP = "no shutdown - Enable interface"
+    
     def get_help(self):
-        return "no shutdown - Enable interface"
+        return self.HELP
 
 class ExitCommand(Command):
     """Comando exit - retrocede un nivel de modo"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
-        if cli_context.current_mode == "config-if":
-            cli_context.current_mode = "config"
+        mode = cli_context.current_mode
+        if mode is MODE_CFG_IF:
+            cli_context.current_mode = MODE_CFG
             cli_context.current_interface = None
+            cli_context.current_interface_obj = None
             return True, "Exited interface configuration mode"
-        elif cli_context.current_mode == "config":
-            cli_context.current_mode = "privileged"
+        elif mode is MODE_CFG:
+            cli_context.current_mode = MODE_PRIV
             return True, "Exited global configuration mode"
-        elif cli_context.current_mode == "privileged":
-            cli_context.current_mode = "user"
+        elif mode is MODE_PRIV:
+            cli_context.current_mode = MODE_USER
             return True, "Exited privileged mode"
         else:
             return False, "Cannot exit from user mode"
     
+    HELP = "exit - Exit current configuration mode"
+    
     def get_help(self):
-        return "exit - Exit current configuration mode"
+        return self.HELP
 
 class EndCommand(Command):
     """Comando end - sale directamente a modo privilegiado"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
-        if cli_context.current_mode in ["config", "config-if"]:
-            cli_context.current_mode = "privileged"
+        if cli_context.current_mode in (MODE_CFG, MODE_CFG_IF):
+            cli_context.current_mode = MODE_PRIV
             cli_context.current_interface = None
+            cli_context.current_interface_obj = None
             return True, "Returned to privileged mode"
         return False, "Already in privileged or user mode"
     
+    HELP = "end - Return directly to privileged mode"
+    
     def get_help(self):
-        return "end - Return directly to privileged mode"
+        return self.HELP
 
 class ConnectCommand(Command):
     """Comando connect - conecta dos interfaces de dispositivos"""
+    __slots__ = ()
     
+    EXPECTED_ARGC = 3
+    USAGE = "Usage: connect <interface1> <device2> <interface2>"
+    
+    @requires_mode(MODE_PRIV)
     def execute(self, cli_context, args):
-        if cli_context.current_mode != "privileged":
-            return False, "Must be in privileged mode"
-        
-        if len(args) != 3:
-            return False, "Usage: connect <interface1> <device2> <interface2>"
+        err = self._check_argc(args)
+        if err:
+            return err
         
         interface1, device2_name, interface2 = args
         device1_name = cli_context.current_device.name
@@ -218,18 +354,23 @@ class ConnectCommand(Command):
             return True, f"Connected {device1_name}:{interface1} to {device2_name}:{interface2}"
         return False, "Failed to connect devices"
     
+    HELP = "connect <iface1> <device2> <iface2> - Connect two device interfaces"
+    
     def get_help(self):
-        return "connect <iface1> <device2> <iface2> - Connect two device interfaces"
+        return self.HELP
 
 class DisconnectCommand(Command):
     """Comando disconnect - desconecta dos interfaces"""
+    __slots__ = ()
+    
+    EXPECTED_ARGC = 3
+    USAGE = "Usage: disconnect <interface1> <device2> <interface2>"
     
+    @requires_mode(MODE_PRIV)
     def execute(self, cli_context, args):
-        if cli_context.current_mode != "privileged":
-            return False, "Must be in privileged mode"
-        
-        if len(args) != 3:
-            return False, "Usage: disconnect <interface1> <device2> <interface2>"
+        err = self._check_argc(args)
+        if err:
+            return err
         
         interface1, device2_name, interface2 = args
         device1_name = cli_context.current_device.name
@@ -238,21 +379,26 @@ class DisconnectCommand(Command):
             return True, f"Disconnected {device1_name}:{interface1} from {device2_name}:{interface2}"
         return False, "Failed to disconnect devices"
     
+    HELP = "disconnect <iface1> <device2> <iface2> - Disconnect two device interfaces"
+    
     def get_help(self):
-        return "disconnect <iface1> <device2> <iface2> - Disconnect two device interfaces"
+        return self.HELP
 
 class ListDevicesCommand(Command):
     """Comando list_devices - lista todos los dispositivos"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
-        devices = cli_context.network.list_devices()
-        return True, "Devices in network:\n" + "\n".join(devices)
+        return True, "Devices in network:\n" + cli_context.network.list_devices_str()
+    
+    HELP = "list_devices - List all devices in the network"
     
     def get_help(self):
-        return "list_devices - List all devices in the network"
+        return self.HELP
 
 class SendCommand(Command):
     """Comando send - envía un paquete"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
         if len(args) < 2:
@@ -260,14 +406,25 @@ class SendCommand(Command):
         
         destination_ip = args[0]
         message = args[1]
-        ttl = int(args[2]) if len(args) > 2 else 64
-        
-        # Buscar interfaz de origen
-        source_ip = None
-        for interface in cli_context.current_device.interfaces.values():
-            if interface.ip_address and interface.is_up:
-                source_ip = interface.ip_address
-                break
+        ttl = 64
+        if len(args) > 2:
+            # isdigit evita montar la maquinaria de excepciones para la
+            # ruta común y para la entrada inválida
+            if not args[2].isdigit():
+                return False, "TTL must be a number"
+            ttl = int(args[2])
+        
+        # Buscar interfaz de origen (memoizada en el dispositivo; los
+        # comandos que tocan interfaces ponen la caché en None)
+        device = cli_context.current_device
+        source_ip = device._source_ip_cache
+        if source_ip is None:
+            source_ip = False
+            for interface in device.interfaces.values():
+                if interface.ip_address and interface.is_up:
+                    source_ip = interface.ip_address
+                    break
+            device._source_ip_cache = source_ip
         
         if not source_ip:
             return False, "No active interface with IP address found"
@@ -277,11 +434,14 @@ class SendCommand(Command):
             return True, "Message queued for delivery"
         return False, "Failed to send packet"
     
+    HELP = "send <dest_ip> <message> [ttl] - Send a packet to destination"
+    
     def get_help(self):
-        return "send <dest_ip> <message> [ttl] - Send a packet to destination"
+        return self.HELP
 
 class TickCommand(Command):
     """Comando tick/process - avanza la simulación un paso"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
         results = cli_context.network.tick()
@@ -289,126 +449,156 @@ class TickCommand(Command):
             return True, "\n".join(results)
         return True, "No packets to process"
     
+    HELP = "tick/process - Advance simulation one step"
+    
     def get_help(self):
-        return "tick/process - Advance simulation one step"
+        return self.HELP
 
 class ShowCommand(Command):
     """Comando show - muestra información del sistema"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
         if len(args) == 0:
             return False, "Usage: show <subcommand>"
         
-        subcommand = args[0].lower()
+        # Buscar primero el token crudo: en uso automatizado ya viene en
+        # minúsculas y se ahorra la asignación de str.lower()
+        raw = args[0]
+        handler = self._DISPATCH.get(raw)
+        if handler is None:
+            handler = self._DISPATCH.get(raw.lower())
+            if handler is None:
+                return False, f"Unknown show subcommand: {raw.lower()}"
+        return handler(self, cli_context, args[1:])
+    
+    def _show_history(self, cli_context, args):
+        device_name = args[0] if args else cli_context.current_device.name
+        device = cli_context.network.get_device(device_name)
+        if not device:
+            return False, f"Device {device_name} not found"
         
-        if subcommand == "history":
-            device_name = args[1] if len(args) > 1 else cli_context.current_device.name
-            device = cli_context.network.get_device(device_name)
-            if not device:
-                return False, f"Device {device_name} not found"
-            
-            history = device.get_message_history()
-            if not history:
-                return True, f"No message history for {device_name}"
-            
-            result = f"Message history for {device_name}:\n"
-            for i, packet in enumerate(history, 1):
-                ttl_status = "TTL expired" if packet.dropped and packet.drop_reason == "TTL expired" else "No"
-                result += f"{i}) From {packet.source_ip} to {packet.destination_ip}: \"{packet.content}\" | "
-                result += f"TTL at arrival: {packet.ttl} | Path: {packet.get_route_trace_string()}\n"
-            
-            return True, result.strip()
+        history = device.get_message_history()
+        if not history:
+            return True, f"No message history for {device_name}"
         
-        elif subcommand == "queue":
-            device_name = args[1] if len(args) > 1 else cli_context.current_device.name
-            device = cli_context.network.get_device(device_name)
-            if not device:
-                return False, f"Device {device_name} not found"
-            
-            queue_status = device.get_queue_status()
-            result = f"Queue status for {device_name}:\n"
-            
-            for interface_name, queues in queue_status.items():
-                result += f"Interface {interface_name}:\n"
-                result += f"  Outgoing: {len(queues['outgoing'])} packets\n"
-                result += f"  Incoming: {len(queues['incoming'])} packets\n"
-            
-            return True, result.strip()
+        lines = [f"Message history for {device_name}:"]
+        for i, packet in enumerate(history, 1):
+            lines.append(f"{i}) From {packet.source_ip} to {packet.destination_ip}: \"{packet.content}\" | "
+                         f"TTL at arrival: {packet.ttl} | Path: {packet.get_route_trace_string()}")
+        
+        return True, "\n".join(lines)
+    
+    def _show_queue(self, cli_context, args):
+        device_name = args[0] if args else cli_context.current_device.name
+        device = cli_context.network.get_device(device_name)
+        if not device:
+            return False, f"Device {device_name} not found"
+        
+        queue_status = device.get_queue_status()
+        lines = [f"Queue status for {device_name}:"]
+        
+        for interface_name, queues in queue_status.items():
+            lines.append(f"Interface {interface_name}:")
+            lines.append(f"  Outgoing: {len(queues['outgoing'])} packets")
+            lines.append(f"  Incoming: {len(queues['incoming'])} packets")
+        
+        return True, "\n".join(lines)
+    
+    def _show_interfaces(self, cli_context, args):
+        device = cli_context.current_device
+        interfaces_status = device.get_interfaces_status()
+        
+        lines = [f"Interfaces for {device.name}:"]
+        for name, status in interfaces_status.items():
+            state = "up" if status['is_up'] else "down"
+            ip = status['ip_address'] or "unassigned"
+            connections = ", ".join(status['connected_to']) or "none"
+            lines.append(f"  {name}: {state} | IP: {ip} | Connected to: {connections}")
+        
+        return True, "\n".join(lines)
+    
+    def _show_statistics(self, cli_context, args):
+        stats = cli_context.network.get_network_statistics()
+        lines = [
+            "Network Statistics:",
+            f"Total packets sent: {stats['total_packets_sent']}",
+            f"Delivered: {stats['delivered']}",
+            f"Dropped (TTL): {stats['dropped_ttl']}",
+            f"Dropped (Firewall): {stats['dropped_firewall']}",
+            f"Average hops: {stats['average_hops']}",
+        ]
+        if stats['top_talker']:
+            lines.append(f"Top talker: {stats['top_talker']}")
+        
+        return True, "\n".join(lines)
+    
+    def _show_ip(self, cli_context, args):
+        if not args:
+            return False, "Unknown show subcommand: ip"
         
-        elif subcommand == "interfaces":
+        if args[0] == "route":
             device = cli_context.current_device
-            interfaces_status = device.get_interfaces_status()
+            routes = device.routing_table.in_order_traversal()
             
-            result = f"Interfaces for {device.name}:\n"
-            for name, status in interfaces_status.items():
-                state = "up" if status['is_up'] else "down"
-                ip = status['ip_address'] or "unassigned"
-                connections = ", ".join(status['connected_to']) or "none"
-                result += f"  {name}: {state} | IP: {ip} | Connected to: {connections}\n"
+            if not routes:
+                return True, "No routes configured\nDefault: none"
             
-            return True, result.strip()
-        
-        elif subcommand == "statistics":
-            stats = cli_context.network.get_network_statistics()
-            result = "Network Statistics:\n"
-            result += f"Total packets sent: {stats['total_packets_sent']}\n"
-            result += f"Delivered: {stats['delivered']}\n"
-            result += f"Dropped (TTL): {stats['dropped_ttl']}\n"
-            result += f"Dropped (Firewall): {stats['dropped_firewall']}\n"
-            result += f"Average hops: {stats['average_hops']}\n"
-            if stats['top_talker']:
-                result += f"Top talker: {stats['top_talker']}"
+            lines = ["Routing table:"]
+            for route in routes:
+                lines.append(f"{route.to_cidr()} via {route.next_hop} metric {route.metric}")
+            lines.append("Default: none")
             
-            return True, result.strip()
-        
-        elif subcommand == "ip" and len(args) > 1:
-            if args[1] == "route":
-                device = cli_context.current_device
-                routes = device.routing_table.in_order_traversal()
-                
-                if not routes:
-                    return True, "No routes configured\nDefault: none"
-                
-                result = "Routing table:\n"
-                for route in routes:
-                    result += f"{route.to_cidr()} via {route.next_hop} metric {route.metric}\n"
-                result += "Default: none"
-                
-                return True, result.strip()
-            elif args[1] == "prefix-tree":
-                tree_display = cli_context.current_device.prefix_trie.display_tree()
-                return True, tree_display
-            elif args[1] == "route-tree":
-                tree_display = cli_context.current_device.routing_table.get_tree_display()
-                return True, tree_display
-        
-        elif subcommand == "route" and len(args) > 1:
-            if args[1] == "avl-stats":
-                return ShowRouteAvlStatsCommand().execute(cli_context, [])
-        
-        elif subcommand == "snapshots":
-            return ShowSnapshotsCommand().execute(cli_context, [])
-        
-        elif subcommand == "error-log":
-            limit_args = args[1:] if len(args) > 1 else []
-            return ShowErrorLogCommand().execute(cli_context, limit_args)
-        
-        
-        else:
-            return False, f"Unknown show subcommand: {subcommand}"
+            return True, "\n".join(lines)
+        elif args[0] == "prefix-tree":
+            tree_display = cli_context.current_device.prefix_trie.display_tree()
+            return True, tree_display
+        elif args[0] == "route-tree":
+            tree_display = cli_context.current_device.routing_table.get_tree_display()
+            return True, tree_display
+        
+        return False, "Unknown show subcommand: ip"
+    
+    def _show_route(self, cli_context, args):
+        if args and args[0] == "avl-stats":
+            return self._ROUTE_AVL.execute(cli_context, [])
+        return False, "Unknown show subcommand: route"
+    
+    def _show_snapshots(self, cli_context, args):
+        return self._SNAPSHOTS.execute(cli_context, [])
+    
+    def _show_error_log(self, cli_context, args):
+        return self._ERROR_LOG.execute(cli_context, args)
+    
+    # Tabla de despacho: una búsqueda hash en vez de N comparaciones de cadena
+    _DISPATCH = {
+        "history": _show_history,
+        "queue": _show_queue,
+        "interfaces": _show_interfaces,
+        "statistics": _show_statistics,
+        "ip": _show_ip,
+        "route": _show_route,
+        "snapshots": _show_snapshots,
+        "error-log": _show_error_log,
+    }
+    
+    HELP = "show <history|queue|interfaces|statistics|ip|route|snapshots|error-log> - Show system information"
     
     def get_help(self):
-        return "show <history|queue|interfaces|statistics|ip|route|snapshots|error-log> - Show system information"
+        return self.HELP
 
 class SetDeviceStatusCommand(Command):
     """Comando set_device_status - cambia estado online/offline"""
+    __slots__ = ()
+    
+    EXPECTED_ARGC = 2
+    USAGE = "Usage: set_device_status <device> <online|offline>"
     
+    @requires_mode(MODE_PRIV)
     def execute(self, cli_context, args):
-        if cli_context.current_mode != "privileged":
-            return False, "Must be in privileged mode"
-        
-        if len(args) != 2:
-            return False, "Usage: set_device_status <device> <online|offline>"
+        err = self._check_argc(args)
+        if err:
+            return err
         
         device_name, status = args
         
@@ -419,46 +609,31 @@ class SetDeviceStatusCommand(Command):
             return True, f"Device {device_name} set to {status}"
         return False, f"Device {device_name} not found"
     
+    HELP = "set_device_status <device> <online|offline> - Change device status"
+    
     def get_help(self):
-        return "set_device_status <device> <online|offline> - Change device status"
+        return self.HELP
 
 class SaveConfigCommand(Command):
     """Comando save running-config - guarda la configuración"""
+    __slots__ = ()
     
+    @requires_mode(MODE_PRIV)
     def execute(self, cli_context, args):
-        if cli_context.current_mode != "privileged":
-            return False, "Must be in privileged mode"
-        
         filename = args[0] if args else "running-config.json"
         
         if cli_context.network.save_configuration(filename):
             return True, f"Configuration saved to {filename}"
         return False, "Failed to save configuration"
     
-    def get_help(self):
-        return "save running-config [filename] - Save current configuration"
-
-class LoadConfigCommand(Command):
-    """Comando load config - carga una configuración"""
-    
-    def execute(self, cli_context, args):
-        if cli_context.current_mode != "privileged":
-            return False, "Must be in privileged mode"
-        
-        if len(args) != 1:
-            return False, "Usage: load config <filename>"
-        
-        filename = args[0]
-        
-        if cli_context.network.load_configuration(filename):
-            return True, f"Configuration loaded from {filename}"
-        return False, f"Failed to load configuration from {filename}"
+    HELP = "save running-config [filename] - Save current configuration"
     
     def get_help(self):
-        return "load config <filename> - Load configuration from file"
+        return self.HELP
 
 class ConsoleCommand(Command):
     """Comando console - cambia el dispositivo activo"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
         if len(args) != 1:
@@ -476,37 +651,42 @@ class ConsoleCommand(Command):
         
         return True, f"Switched to {device_name}"
     
+    HELP = "console <device> - Switch to device console"
+    
     def get_help(self):
-        return "console <device> - Switch to device console"
+        return self.HELP
 
 class HelpCommand(Command):
     """Comando help - muestra ayuda de comandos"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
         commands = cli_context.get_available_commands()
-        help_text = "Available commands:\n"
-        
-        for cmd_name, cmd_obj in commands.items():
-            help_text += f"  {cmd_obj.get_help()}\n"
-        
-        return True, help_text.strip()
+        return True, "Available commands:\n" + "\n".join(
+            f"  {cmd_obj.HELP}" for cmd_obj in commands.values()
+        )
+    
+    HELP = "help - Show available commands"
     
     def get_help(self):
-        return "help - Show available commands"
+        return self.HELP
 
 class IpCommand(Command):
     """Comando ip - maneja subcomandos de IP"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
         if len(args) < 1:
             return False, "Usage: ip <subcommand>"
         
-        subcommand = args[0].lower()
+        subcommand = args[0]
+        if subcommand != "address" and subcommand != "route":
+            subcommand = subcommand.lower()
         
-        if subcommand == "address" and cli_context.current_mode == "config-if":
-            return IpAddressCommand().execute(cli_context, args)
+        if subcommand == "address" and cli_context.current_mode is MODE_CFG_IF:
+            return self._ADDRESS.execute(cli_context, args)
         
-        elif subcommand == "route" and cli_context.current_mode == "config":
+        elif subcommand == "route" and cli_context.current_mode is MODE_CFG:
             if len(args) < 2:
                 return False, "Usage: ip route <add|del>"
             
@@ -537,13 +717,12 @@ class IpCommand(Command):
         
         if len(args) > 4 and args[4] == "metric":
             if len(args) > 5:
-                try:
-                    metric = int(args[5])
-                except ValueError:
+                if not args[5].isdigit():
                     return False, "Metric must be a number"
+                metric = int(args[5])
         
         cli_context.current_device.routing_table.insert(prefix, mask, next_hop, metric)
-        return True, f"Route {prefix}/{self._mask_to_cidr(mask)} via {next_hop} metric {metric} added"
+        return True, f"Route {prefix}/{_mask_to_cidr(mask)} via {next_hop} metric {metric} added"
     
     def _handle_route_del(self, cli_context, args):
         """Maneja ip route del"""
@@ -558,25 +737,21 @@ class IpCommand(Command):
         route_exists = any(r.prefix == prefix and r.mask == mask for r in routes)
         
         if not route_exists:
-            cli_context.current_device.error_log.log_error("RouteNotFound", f"Route {prefix}/{self._mask_to_cidr(mask)} not found")
-            return False, f"Route {prefix}/{self._mask_to_cidr(mask)} not found"
+            cli_context.current_device.error_log.log_error("RouteNotFound", f"Route {prefix}/{_mask_to_cidr(mask)} not found")
+            return False, f"Route {prefix}/{_mask_to_cidr(mask)} not found"
         
         cli_context.current_device.routing_table.delete(prefix, mask)
-        return True, f"Route {prefix}/{self._mask_to_cidr(mask)} deleted"
+        return True, f"Route {prefix}/{_mask_to_cidr(mask)} deleted"
     
-    def _mask_to_cidr(self, mask):
-        """Convierte máscara a notación CIDR"""
-        cidr = 0
-        for octet in mask.split('.'):
-            cidr += bin(int(octet)).count('1')
-        return cidr
+    HELP = "ip <address|route> - IP configuration commands"
     
     def get_help(self):
-        return "ip <address|route> - IP configuration commands"
+        return self.HELP
 
 
 class ShowIpRouteCommand(Command):
     """Comando show ip route - muestra tabla de rutas AVL"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
         device = cli_context.current_device
@@ -585,18 +760,21 @@ class ShowIpRouteCommand(Command):
         if not routes:
             return True, "No routes configured\nDefault: none"
         
-        result = "Routing table:\n"
+        lines = ["Routing table:"]
         for route in routes:
-            result += f"{route.to_cidr()} via {route.next_hop} metric {route.metric}\n"
-        result += "Default: none"
+            lines.append(f"{route.to_cidr()} via {route.next_hop} metric {route.metric}")
+        lines.append("Default: none")
         
-        return True, result.strip()
+        return True, "\n".join(lines)
+    
+    HELP = "show ip route - Display AVL routing table"
     
     def get_help(self):
-        return "show ip route - Display AVL routing table"
+        return self.HELP
 
 class ShowRouteAvlStatsCommand(Command):
     """Comando show route avl-stats - muestra estadísticas del AVL"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
         avl = cli_context.current_device.routing_table
@@ -608,17 +786,18 @@ class ShowRouteAvlStatsCommand(Command):
         
         return True, result
     
+    HELP = "show route avl-stats - Display AVL tree statistics"
+    
     def get_help(self):
-        return "show route avl-stats - Display AVL tree statistics"
+        return self.HELP
 
 
 class SaveSnapshotCommand(Command):
     """Comando save snapshot - guarda snapshot indexado"""
+    __slots__ = ()
     
+    @requires_mode(MODE_PRIV)
     def execute(self, cli_context, args):
-        if cli_context.current_mode != "privileged":
-            return False, "Must be in privileged mode"
-        
         if len(args) < 2 or args[0] != "snapshot":
             return False, "Usage: save snapshot <key>"
         
@@ -629,28 +808,44 @@ class SaveSnapshotCommand(Command):
             return True, f"[OK] snapshot {key} -> file: {result} (indexed)"
         return False, result
     
+    HELP = "save snapshot <key> - Save and index snapshot"
+    
     def get_help(self):
-        return "save snapshot <key> - Save and index snapshot"
+        return self.HELP
 
 class LoadConfigCommand(Command):
-    """Comando load config - carga configuración desde B-tree"""
-    
+    """Comando load config - carga desde el B-tree o desde archivo
+
+    Antes había dos clases LoadConfigCommand y la segunda (por clave del
+    B-tree) sombreaba silenciosamente a la primera (por archivo). Una sola
+    clase decide según el argumento: las rutas .json van al cargador de
+    archivos de la red y el resto se resuelve como clave de snapshot.
+    """
+    __slots__ = ()
+    
+    @requires_mode(MODE_PRIV)
     def execute(self, cli_context, args):
-        if cli_context.current_mode != "privileged":
-            return False, "Must be in privileged mode"
-        
         if len(args) < 2 or args[0] != "config":
-            return False, "Usage: load config <key>"
+            return False, "Usage: load config <key|filename.json>"
         
-        key = args[1]
-        success, result = cli_context.current_device.load_snapshot(key)
+        target = args[1]
+        
+        if target.endswith(".json"):
+            if cli_context.network.load_configuration(target):
+                return True, f"Configuration loaded from {target}"
+            return False, f"Failed to load configuration from {target}"
+        
+        success, result = cli_context.current_device.load_snapshot(target)
         return success, result
     
+    HELP = "load config <key|filename.json> - Load snapshot by key or configuration file"
+    
     def get_help(self):
-        return "load config <key> - Load configuration from B-tree index"
+        return self.HELP
 
 class ShowSnapshotsCommand(Command):
     """Comando show snapshots - lista snapshots del B-tree"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
         snapshots = cli_context.current_device.snapshot_index.in_order_traversal()
@@ -658,17 +853,20 @@ class ShowSnapshotsCommand(Command):
         if not snapshots:
             return True, "No snapshots found"
         
-        result = "Snapshots:\n"
+        lines = ["Snapshots:"]
         for key, filename in snapshots:
-            result += f"{key} -> {filename}\n"
+            lines.append(f"{key} -> {filename}")
         
-        return True, result.strip()
+        return True, "\n".join(lines)
+    
+    HELP = "show snapshots - List B-tree indexed snapshots"
     
     def get_help(self):
-        return "show snapshots - List B-tree indexed snapshots"
+        return self.HELP
 
 class BtreeStatsCommand(Command):
     """Comando btree stats - estadísticas del B-tree"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
         btree = cli_context.current_device.snapshot_index
@@ -679,20 +877,23 @@ class BtreeStatsCommand(Command):
         
         return True, result
     
+    HELP = "btree stats - Display B-tree statistics"
+    
     def get_help(self):
-        return "btree stats - Display B-tree statistics"
+        return self.HELP
 
 class PolicyCommand(Command):
     """Comando policy - maneja políticas del trie"""
+    __slots__ = ()
     
+    @requires_mode(MODE_CFG)
     def execute(self, cli_context, args):
-        if cli_context.current_mode != "config":
-            return False, "Must be in configuration mode"
-        
         if len(args) < 1:
             return False, "Usage: policy <set|unset>"
         
-        action = args[0].lower()
+        action = args[0]
+        if action != "set" and action != "unset":
+            action = action.lower()
         
         if action == "set":
             return self._handle_policy_set(cli_context, args[1:])
@@ -711,15 +912,16 @@ class PolicyCommand(Command):
         
         if args[2] == "block":
             cli_context.current_device.prefix_trie.set_policy(prefix, mask, "block", True)
-            return True, f"Block policy set for {prefix}/{self._mask_to_cidr(mask)}"
+            cli_context.current_device._policy_version += 1
+            return True, f"Block policy set for {prefix}/{_mask_to_cidr(mask)}"
         
         elif args[2] == "ttl-min" and len(args) > 3:
-            try:
-                ttl_min = int(args[3])
-                cli_context.current_device.prefix_trie.set_policy(prefix, mask, "ttl-min", ttl_min)
-                return True, f"TTL minimum {ttl_min} set for {prefix}/{self._mask_to_cidr(mask)}"
-            except ValueError:
+            if not args[3].isdigit():
                 return False, "TTL minimum must be a number"
+            ttl_min = int(args[3])
+            cli_context.current_device.prefix_trie.set_policy(prefix, mask, "ttl-min", ttl_min)
+            cli_context.current_device._policy_version += 1
+            return True, f"TTL minimum {ttl_min} set for {prefix}/{_mask_to_cidr(mask)}"
         
         return False, "Usage: policy set <prefix> <mask> <ttl-min N | block>"
     
@@ -733,54 +935,51 @@ class PolicyCommand(Command):
         
         # Para simplificar, recreamos el nodo sin políticas
         cli_context.current_device.prefix_trie.insert_prefix(prefix, mask, {})
-        return True, f"Policies removed for {prefix}/{self._mask_to_cidr(mask)}"
+        cli_context.current_device._policy_version += 1
+        return True, f"Policies removed for {prefix}/{_mask_to_cidr(mask)}"
     
-    def _mask_to_cidr(self, mask):
-        """Convierte máscara a notación CIDR"""
-        cidr = 0
-        for octet in mask.split('.'):
-            cidr += bin(int(octet)).count('1')
-        return cidr
+    HELP = "policy <set|unset> - Configure prefix policies"
     
     def get_help(self):
-        return "policy <set|unset> - Configure prefix policies"
+        return self.HELP
 
 
 class ShowErrorLogCommand(Command):
     """Comando show error-log - muestra log de errores"""
+    __slots__ = ()
     
     def execute(self, cli_context, args):
         limit = None
-        if args and len(args) > 0:
-            try:
-                limit = int(args[0])
-            except ValueError:
+        if args:
+            if not args[0].isdigit():
                 return False, "Limit must be a number"
+            limit = int(args[0])
         
         errors = cli_context.current_device.error_log.get_errors(limit)
         
         if not errors:
             return True, "No errors logged"
         
-        result = "Error Log:\n"
+        lines = ["Error Log:"]
         for error in errors:
-            result += f"[{error.timestamp}] {error.error_type}: {error.message}"
+            line = f"[{error.timestamp}] {error.error_type}: {error.message}"
             if error.command:
-                result += f" (Command: {error.command})"
-            result += "\n"
+                line += f" (Command: {error.command})"
+            lines.append(line)
         
-        return True, result.strip()
+        return True, "\n".join(lines)
+    
+    HELP = "show error-log [n] - Display error log (optional limit)"
     
     def get_help(self):
-        return "show error-log [n] - Display error log (optional limit)"
+        return self.HELP
 
 class AddDeviceCommand(Command):
     """Comando add device - agrega un nuevo dispositivo a la red"""
+    __slots__ = ()
     
+    @requires_mode(MODE_PRIV)
     def execute(self, cli_context, args):
-        if cli_context.current_mode != "privileged":
-            return False, "Must be in privileged mode"
-        
         if len(args) < 2:
             return False, "Usage: add device <name> <type>"
         
@@ -811,8 +1010,49 @@ class AddDeviceCommand(Command):
     
     def _validate_device_name(self, device_name):
         """Valida el formato del nombre del dispositivo"""
-        pattern = r'^[a-zA-Z0-9][a-zA-Z0-9\-_]*[a-zA-Z0-9]$|^[a-zA-Z0-9]$'
-        return re.match(pattern, device_name) and len(device_name) <= 64
+        if not device_name or len(device_name) > 64:
+            return False
+        return _HOSTNAME_RE.fullmatch(device_name) is not None
+    
+    HELP = "add device <name> <type> - Add a new device to the network (types: router, switch, host)"
     
     def get_help(self):
-        return "add device <name> <type> - Add a new device to the network (types: router, switch, host)"
\ No newline at end of file
+        return self.HELP
+
+# Instancias compartidas para los comandos compuestos, colgadas como
+# atributos de clase una vez declaradas todas las clases: evita construir
+# un objeto nuevo en cada invocación dentro de show/ip
+ShowCommand._ROUTE_AVL = ShowRouteAvlStatsCommand()
+ShowCommand._SNAPSHOTS = ShowSnapshotsCommand()
+ShowCommand._ERROR_LOG = ShowErrorLogCommand()
+IpCommand._ADDRESS = IpAddressCommand()
+
+# Registro a nivel de módulo: una sola instancia por comando (son sin
+# estado), poblado una vez en el import. El CLI arma sus tablas por modo
+# a partir de estas mismas instancias
+COMMAND_REGISTRY = {
+    "enable": EnableCommand(),
+    "disable": DisableCommand(),
+    "configure": ConfigureTerminalCommand(),
+    "connect": ConnectCommand(),
+    "disconnect": DisconnectCommand(),
+    "set_device_status": SetDeviceStatusCommand(),
+    "list_devices": ListDevicesCommand(),
+    "add": AddDeviceCommand(),
+    "send": SendCommand(),
+    "show": ShowCommand(),
+    "save": SaveSnapshotCommand(),
+    "load": LoadConfigCommand(),
+    "btree": BtreeStatsCommand(),
+    "tick": TickCommand(),
+    "console": ConsoleCommand(),
+    "help": HelpCommand(),
+    "exit": ExitCommand(),
+    "end": EndCommand(),
+    "hostname": HostnameCommand(),
+    "interface": InterfaceCommand(),
+    "ip": IpCommand(),
+    "policy": PolicyCommand(),
+    "shutdown": ShutdownCommand(),
+    "no": NoShutdownCommand(),
+}
@@ -2,8 +2,27 @@
 Gestor de configuración para guardar y cargar estado del simulador
 """
 import json
+import mmap
 import os
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
+from itertools import count
+
+# orjson (C + SIMD) serializa 3-10x más rápido que el json de la stdlib;
+# si no está instalado se degrada al camino estándar sin cambiar el formato
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Tope blando del búfer de guardado reciclado; por encima se encoge tras
+# escribir para no retener picos de memoria de configuraciones enormes
+_SAVE_BUF_CAP = 1 << 20
+
+# Sufijos únicos para los archivos temporales de publicación atómica
+_TMP_COUNTER = count()
 
 class ConfigurationManager:
     """Maneja la persistencia de configuración del simulador"""
@@ -11,22 +30,40 @@ class ConfigurationManager:
     def __init__(self, network):
         self.network = network
         self.config_dir = "configs"
+        # Línea base del último volcado COMPLETO: los deltas se escriben
+        # solo contra volcados autogenerados (nombre con timestamp) que
+        # nadie reescribe; un archivo con nombre explícito o preexistente
+        # siempre recibe un volcado completo
+        self._last_snapshot = None
+        self._last_snapshot_file = None
+        # Lista de conexiones memoizada por versión de topología
+        self._conn_cache = (None, None)
+        # Listado de archivos memoizado por mtime del directorio
+        self._files_cache = (None, None)
+        # Cuerpo del export estilo Cisco memoizado por versión de topología
+        self._cisco_cache = (None, None)
+        # Descriptor reutilizable para el running-config canónico: se abre
+        # una vez y los guardados posteriores hacen ftruncate + pwrite +
+        # fdatasync sin reabrir el archivo
+        self._running_fd = None
+        # Búfer de bytes reciclado entre guardados (patrón búfer de WAL):
+        # acota la presión del alocador en guardados repetidos
+        self._save_buf = bytearray()
+        # Pool de escritura para guardados asíncronos; se crea al primer uso
+        self._io_pool = None
         self._ensure_config_directory()
     
     def _ensure_config_directory(self):
         """Crea el directorio de configuraciones si no existe"""
-        if not os.path.exists(self.config_dir):
-            os.makedirs(self.config_dir)
+        # exist_ok evita el stat previo y la carrera exists/makedirs
+        os.makedirs(self.config_dir, exist_ok=True)
     
-    def save_running_config(self, filename=None):
-        """
-        Guarda la configuración actual en formato JSON
-        
-        Args:
-            filename (str): Nombre del archivo, por defecto running-config.json
-        """
+    def _prepare_save(self, filename, include_stats=True):
+        """Resuelve nombre, documento (delta o completo) y payload de bytes"""
+        autogenerated = filename is None
         if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            # time.strftime es una llamada C directa, sin instanciar datetime
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
             filename = f"running-config_{timestamp}.json"
         
         if not filename.endswith('.json'):
@@ -34,48 +71,189 @@ class ConfigurationManager:
         
         filepath = os.path.join(self.config_dir, filename)
         
+        # Serializar dispositivos en una sola comprensión: el dict externo
+        # nace con su tamaño final (sin redimensionados incrementales) y
+        # orjson lo recorre ya completo
+        devices_out = {
+            device_name: {
+                "name": device.name,
+                "type": device.device_type,
+                "online": device.is_online,
+                "interfaces": {
+                    interface_name: {
+                        "name": interface.name,
+                        "ip_address": interface.ip_address,
+                        "is_up": interface.is_up,
+                        "outgoing_queue_size": len(interface.outgoing_queue),
+                        "incoming_queue_size": len(interface.incoming_queue)
+                    }
+                    for interface_name, interface in device.interfaces.items()
+                }
+            }
+            for device_name, device in self.network.devices.items()
+        }
+        
         config_data = {
             "metadata": {
-                "created_at": datetime.now().isoformat(),
+                "created_at": datetime.now().isoformat(timespec='seconds'),
                 "version": "1.0",
                 "description": "Router Simulator Configuration"
             },
-            "devices": {},
-            "connections": [],
-            "statistics": self.network.get_network_statistics()
+            "devices": devices_out,
+            "connections": self._get_network_connections()
         }
+        # Las estadísticas recorren la actividad de todos los dispositivos
+        # (top talker); se omiten cuando el llamador no las necesita
+        if include_stats:
+            config_data["statistics"] = self.network.get_network_statistics()
         
-        # Serializar dispositivos
-        for device_name, device in self.network.devices.items():
-            config_data["devices"][device_name] = {
-                "name": device.name,
-                "type": device.device_type,
-                "online": device.is_online,
-                "interfaces": {}
+        # Con línea base previa se escribe solo el delta de dispositivos;
+        # las conexiones y estadísticas son pequeñas y van completas.
+        # Solo se emite delta sobre un archivo nuevo con nombre
+        # autogenerado: reescribir un archivo existente (o el canónico
+        # running-config.json) como delta dejaría colgando a los
+        # documentos que lo usan como base
+        devices = config_data["devices"]
+        base = self._last_snapshot
+        is_full = True
+        if (base is not None and autogenerated
+                and filename != self._last_snapshot_file
+                and not os.path.exists(filepath)):
+            is_full = False
+            document = {
+                "metadata": config_data["metadata"],
+                "base": self._last_snapshot_file,
+                "delta": {
+                    "devices": {
+                        name: data for name, data in devices.items()
+                        if base.get(name) != data
+                    }
+                },
+                "removed_devices": [name for name in base if name not in devices],
+                "connections": config_data["connections"]
             }
-            
-            # Serializar interfaces
-            for interface_name, interface in device.interfaces.items():
-                config_data["devices"][device_name]["interfaces"][interface_name] = {
-                    "name": interface.name,
-                    "ip_address": interface.ip_address,
-                    "is_up": interface.is_up,
-                    "outgoing_queue_size": len(interface.outgoing_queue),
-                    "incoming_queue_size": len(interface.incoming_queue)
-                }
+            if include_stats:
+                document["statistics"] = config_data["statistics"]
+        else:
+            document = config_data
+
+        # Solo un volcado completo autogenerado puede ser línea base: los
+        # nombres con timestamp no se reescriben (el guard de existencia
+        # fuerza volcado completo), mientras que un nombre explícito se
+        # pisa en cada guardado con el mismo nombre
+        is_base = is_full and autogenerated
+
+        # Serializar en memoria y escribir de una sola vez: json.dump
+        # emite muchas escrituras pequeñas (una por token/indentación)
+        if orjson is not None:
+            payload = orjson.dumps(
+                document, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+            )
+        else:
+            payload = json.dumps(document, indent=2, ensure_ascii=False).encode('utf-8')
         
-        # Serializar conexiones
-        config_data["connections"] = self._get_network_connections()
+        return filename, filepath, payload, devices, is_base
+    
+    def save_running_config(self, filename=None, include_stats=True):
+        """
+        Guarda la configuración actual en formato JSON
         
+        Args:
+            filename (str): Nombre del archivo, por defecto running-config.json
+            include_stats (bool): Si False, omite el bloque de estadísticas
+        """
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(config_data, f, indent=2, ensure_ascii=False)
-            
+            filename, filepath, payload, devices, is_base = self._prepare_save(
+                filename, include_stats
+            )
+
+            # Reciclar el búfer de guardado: una sola copia contigua viva
+            n = len(payload)
+            buf = self._save_buf
+            if len(buf) < n:
+                buf.extend(bytes(n - len(buf)))
+            buf[:n] = payload
+            view = memoryview(buf)[:n]
+
+            if filename == "running-config.json":
+                # Archivo canónico: descriptor persistente con escritura
+                # posicionada y fdatasync explícito (durable por commit,
+                # sin reabrir ni actualizar metadatos de apertura)
+                if self._running_fd is None:
+                    self._running_fd = os.open(
+                        filepath, os.O_WRONLY | os.O_CREAT, 0o644
+                    )
+                fd = self._running_fd
+                os.ftruncate(fd, 0)
+                os.pwrite(fd, view, 0)
+                os.fdatasync(fd)
+            else:
+                # Publicación atómica: escribir a un temporal y renombrar
+                # encima del destino (rename es atómico en POSIX), de modo
+                # que un corte a mitad de escritura nunca deja un JSON
+                # truncado legible por load_config
+                tmp = f"{filepath}.tmp.{os.getpid()}"
+                with open(tmp, 'wb') as f:
+                    f.write(view)
+                os.replace(tmp, filepath)
+
+            view.release()
+            if len(buf) > _SAVE_BUF_CAP:
+                del buf[_SAVE_BUF_CAP:]
+
+            # Tras un delta (o un volcado con nombre explícito, que es
+            # reescribible) la línea base sigue siendo el mismo volcado
+            # completo inmutable anterior
+            if is_base:
+                self._last_snapshot = devices
+                self._last_snapshot_file = filename
+            elif filename == self._last_snapshot_file:
+                # El archivo base fue reescrito explícitamente: no emitir
+                # más deltas contra él
+                self._last_snapshot = None
+                self._last_snapshot_file = None
             return True, f"Configuration saved to {filepath}"
             
         except Exception as e:
             return False, f"Error saving configuration: {str(e)}"
     
+    def save_running_config_async(self, filename=None):
+        """Guarda la configuración sin bloquear en la escritura a disco
+
+        La serialización corre en el hilo llamador (ve un estado
+        consistente de la red); la escritura se delega al pool y publica
+        de forma atómica vía archivo temporal + os.replace. Retorna un
+        Future cuyo resultado es la tupla (éxito, mensaje).
+        """
+        try:
+            filename, filepath, payload, devices, is_base = self._prepare_save(filename)
+        except Exception as e:
+            future = Future()
+            future.set_result((False, f"Error saving configuration: {str(e)}"))
+            return future
+
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(max_workers=2)
+
+        tmp_path = f"{filepath}.{next(_TMP_COUNTER)}.tmp"
+
+        def _write():
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                os.replace(tmp_path, filepath)
+                # Avanzar la línea base recién con el archivo publicado:
+                # si la escritura falla, los deltas siguientes no deben
+                # referenciar un archivo que nunca existió
+                if is_base:
+                    self._last_snapshot = devices
+                    self._last_snapshot_file = filename
+                return True, f"Configuration saved to {filepath}"
+            except Exception as e:
+                return False, f"Error saving configuration: {str(e)}"
+        
+        return self._io_pool.submit(_write)
+    
     def load_config(self, filename):
         """
         Carga una configuración desde un archivo JSON
@@ -92,20 +270,50 @@ class ConfigurationManager:
             return False, f"Configuration file {filepath} not found"
         
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                config_data = json.load(f)
+            # Mapear el archivo en memoria en vez de leerlo a un búfer
+            # intermedio: el decodificador consume las páginas mapeadas
+            # directamente. mmap rechaza archivos vacíos; esos caen al
+            # read() tradicional
+            with open(filepath, 'rb') as f:
+                try:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError:
+                    mm = None
+                if mm is not None:
+                    try:
+                        config_data = (orjson.loads(memoryview(mm))
+                                       if orjson is not None
+                                       else json.loads(mm[:]))
+                    finally:
+                        mm.close()
+                else:
+                    raw = f.read()
+                    config_data = (orjson.loads(raw) if orjson is not None
+                                   else json.loads(raw))
+            
+            # Resolver documentos delta siguiendo la cadena de bases
+            config_data = self._resolve_config_chain(config_data, {filename})
             
             # Validar estructura del archivo
             if not self._validate_config_structure(config_data):
                 return False, "Invalid configuration file structure"
             
-            # Limpiar red actual
+            # Limpiar red actual; sin el bump de versión las vistas
+            # derivadas de la red seguirían sirviendo los objetos viejos
             self.network.devices.clear()
+            self.network._topology_version += 1
             
-            # Recrear dispositivos
+            # Recrear dispositivos (add_device/add_interface retornan el
+            # objeto creado; el get_* extra solo hace falta si ya existía)
+            # Internar los nombres recién decodificados: cada nombre de
+            # dispositivo/interfaz reaparece en muchas aristas y como clave
+            # de diccionario; internado, esas comparaciones son de puntero
+            intern = sys.intern
             for device_name, device_config in config_data["devices"].items():
-                self.network.add_device(device_name, device_config.get("type", "router"))
-                device = self.network.get_device(device_name)
+                device_name = intern(device_name)
+                device = self.network.add_device(
+                    device_name, device_config.get("type", "router")
+                ) or self.network.get_device(device_name)
                 
                 # Configurar estado del dispositivo
                 if not device_config.get("online", True):
@@ -113,8 +321,9 @@ class ConfigurationManager:
                 
                 # Recrear interfaces
                 for interface_name, interface_config in device_config.get("interfaces", {}).items():
-                    device.add_interface(interface_name)
-                    interface = device.get_interface(interface_name)
+                    interface_name = intern(interface_name)
+                    interface = device.add_interface(interface_name) \
+                        or device.get_interface(interface_name)
                     
                     # Configurar IP si existe
                     if interface_config.get("ip_address"):
@@ -129,53 +338,101 @@ class ConfigurationManager:
             # Recrear conexiones
             for connection in config_data.get("connections", []):
                 self.network.connect_devices(
-                    connection["device1"], connection["interface1"],
-                    connection["device2"], connection["interface2"]
+                    intern(connection["device1"]), intern(connection["interface1"]),
+                    intern(connection["device2"]), intern(connection["interface2"])
                 )
             
+            # El archivo cargado no es una base confiable para deltas
+            # (puede ser un delta o un archivo que el usuario reescriba);
+            # el próximo guardado vuelve a ser un volcado completo
+            self._last_snapshot = None
+            self._last_snapshot_file = None
             return True, f"Configuration loaded successfully from {filepath}"
             
-        except json.JSONDecodeError:
+        except ValueError:
+            # json.JSONDecodeError y orjson.JSONDecodeError derivan de ValueError
             return False, "Invalid JSON format in configuration file"
         except Exception as e:
             return False, f"Error loading configuration: {str(e)}"
     
-    def _validate_config_structure(self, config_data):
-        """Valida la estructura básica del archivo de configuración"""
-        required_keys = ["devices"]
+    def _resolve_config_chain(self, config_data, _seen=None):
+        """Reconstruye el estado completo de un documento delta
+
+        Sigue la cadena de archivos base aplicando los dispositivos
+        cambiados y las eliminaciones de cada delta. Los documentos sin
+        clave "base" ya son volcados completos y se retornan tal cual.
+        Un nombre de archivo repetido en la cadena es un ciclo y corta
+        con error en vez de recorrerlo hasta agotar profundidad.
+        """
+        if "base" not in config_data:
+            return config_data
         
-        for key in required_keys:
-            if key not in config_data:
-                return False
+        base_name = config_data["base"]
+        if _seen is None:
+            _seen = set()
+        if base_name in _seen:
+            raise RuntimeError("Delta base chain cycle detected")
+        _seen.add(base_name)
         
-        # Validar estructura de dispositivos
-        if not isinstance(config_data["devices"], dict):
-            return False
+        base_path = os.path.join(self.config_dir, base_name)
+        with open(base_path, 'rb') as f:
+            raw = f.read()
+        base_doc = orjson.loads(raw) if orjson is not None else json.loads(raw)
+        base_doc = self._resolve_config_chain(base_doc, _seen)
         
-        for device_name, device_config in config_data["devices"].items():
-            if not isinstance(device_config, dict):
-                return False
-            
-            if "interfaces" in device_config and not isinstance(device_config["interfaces"], dict):
-                return False
+        devices = dict(base_doc.get("devices", {}))
+        devices.update(config_data.get("delta", {}).get("devices", {}))
+        for name in config_data.get("removed_devices", []):
+            devices.pop(name, None)
+        
+        return {
+            "metadata": config_data.get("metadata", {}),
+            "devices": devices,
+            "connections": config_data.get("connections", []),
+            "statistics": config_data.get("statistics", {})
+        }
+    
+    def _validate_config_structure(self, config_data):
+        """Valida la estructura básica del archivo de configuración"""
+        devices = config_data.get("devices")
+        if not isinstance(devices, dict):
+            return False
         
-        return True
+        # all() con generador corta en el primer dispositivo malformado
+        # en vez de recorrer siempre la estructura completa
+        return all(
+            isinstance(device_config, dict)
+            and isinstance(device_config.get("interfaces", {}), dict)
+            for device_config in devices.values()
+        )
     
     def _get_network_connections(self):
-        """Obtiene todas las conexiones activas de la red"""
+        """Obtiene todas las conexiones activas de la red
+
+        Memoizada contra la versión de topología de la red: guardados y
+        exportaciones consecutivos sin cambios reutilizan la misma lista.
+        """
+        version = self.network._topology_version
+        cached_version, cached = self._conn_cache
+        if cached_version == version:
+            return cached
+        
         connections = []
         processed_pairs = set()
         
+        seen = processed_pairs.add
         for device_name, device in self.network.devices.items():
             for interface_name, interface in device.interfaces.items():
-                connected_interfaces = interface.connected_interfaces.to_list()
-                
-                for connected_if in connected_interfaces:
-                    # Crear identificador único para el par de conexión
-                    pair_id = tuple(sorted([
-                        f"{device_name}:{interface_name}",
-                        f"{connected_if.device.name}:{connected_if.name}"
-                    ]))
+                neighbors = interface.connected_interfaces
+                if not neighbors:
+                    continue
+                for connected_if in neighbors:
+                    # Deduplicar por identidad de los objetos Interface:
+                    # hashear un par de enteros es mucho más barato que
+                    # formatear y ordenar cadenas por arista
+                    a = id(interface)
+                    b = id(connected_if)
+                    pair_id = (a, b) if a < b else (b, a)
                     
                     if pair_id not in processed_pairs:
                         connections.append({
@@ -184,14 +441,27 @@ class ConfigurationManager:
                             "device2": connected_if.device.name,
                             "interface2": connected_if.name
                         })
-                        processed_pairs.add(pair_id)
+                        seen(pair_id)
         
+        self._conn_cache = (version, connections)
         return connections
     
     def list_config_files(self):
-        """Lista todos los archivos de configuración disponibles"""
+        """Lista todos los archivos de configuración disponibles
+
+        Usa os.scandir (una sola llamada al kernel) y memoiza el resultado
+        contra el mtime del directorio, así los listados repetidos en uso
+        interactivo no reconstruyen la lista.
+        """
         try:
-            files = [f for f in os.listdir(self.config_dir) if f.endswith('.json')]
+            mtime = os.stat(self.config_dir).st_mtime
+            cached_mtime, cached = self._files_cache
+            if cached_mtime == mtime:
+                return cached
+            
+            with os.scandir(self.config_dir) as it:
+                files = [e.name for e in it if e.name.endswith('.json') and e.is_file()]
+            self._files_cache = (mtime, files)
             return files
         except Exception:
             return []
@@ -199,41 +469,62 @@ class ConfigurationManager:
     def export_to_cisco_format(self, filename=None):
         """Exporta la configuración en formato similar a Cisco IOS"""
         if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
             filename = f"cisco_config_{timestamp}.txt"
         
         filepath = os.path.join(self.config_dir, filename)
         
         try:
+            # El cuerpo es determinista respecto al estado de la red: se
+            # memoiza por versión de topología y solo el preámbulo con la
+            # marca de tiempo se regenera en cada export
+            version = self.network._topology_version
+            cached_version, body = self._cisco_cache
+            if cached_version != version:
+                body = self._build_cisco_body()
+                self._cisco_cache = (version, body)
+            
+            prelude = (
+                "! Router Simulator Configuration\n"
+                f"! Generated: {datetime.now().isoformat()}\n"
+                "!\n"
+            )
+            
             with open(filepath, 'w', encoding='utf-8') as f:
-                f.write("! Router Simulator Configuration\n")
-                f.write(f"! Generated: {datetime.now().isoformat()}\n")
-                f.write("!\n")
-                
-                for device_name, device in self.network.devices.items():
-                    f.write(f"!\n! Configuration for {device_name}\n!\n")
-                    f.write(f"hostname {device.name}\n")
-                    
-                    for interface_name, interface in device.interfaces.items():
-                        f.write(f"!\ninterface {interface_name}\n")
-                        
-                        if interface.ip_address:
-                            f.write(f" ip address {interface.ip_address}\n")
-                        
-                        if interface.is_up:
-                            f.write(" no shutdown\n")
-                        else:
-                            f.write(" shutdown\n")
-                        
-                        f.write("!\n")
-                
-                # Agregar conexiones como comentarios
-                f.write("!\n! Connections\n!\n")
-                connections = self._get_network_connections()
-                for conn in connections:
-                    f.write(f"! connect {conn['device1']} {conn['interface1']} {conn['device2']} {conn['interface2']}\n")
+                f.write(prelude + body)
             
             return True, f"Cisco-style configuration exported to {filepath}"
             
         except Exception as e:
-            return False, f"Error exporting configuration: {str(e)}"
\ No newline at end of file
+            return False, f"Error exporting configuration: {str(e)}"
+    
+    def _build_cisco_body(self):
+        """Construye el cuerpo del export estilo Cisco (sin preámbulo)"""
+        # Acumular fragmentos literales y emitir una sola escritura al
+        # final: extend con tuplas de constantes + valores evita el parseo
+        # y las interpolaciones de una f-string por línea
+        parts = []
+        extend = parts.extend
+        
+        for device_name, device in self.network.devices.items():
+            extend(("!\n! Configuration for ", device_name, "\n!\n",
+                    "hostname ", device.name, "\n"))
+
+            for interface_name, interface in device.interfaces.items():
+                extend(("!\ninterface ", interface_name, "\n"))
+
+                if interface.ip_address:
+                    extend((" ip address ", interface.ip_address, "\n"))
+
+                if interface.is_up:
+                    parts.append(" no shutdown\n!\n")
+                else:
+                    parts.append(" shutdown\n!\n")
+
+        # Agregar conexiones como comentarios
+        parts.append("!\n! Connections\n!\n")
+        for conn in self._get_network_connections():
+            extend(("! connect ", conn['device1'], " ", conn['interface1'],
+                    " ", conn['device2'], " ", conn['interface2'], "\n"))
+        
+        return "".join(parts)
\ No newline at end of file
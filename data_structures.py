@@ -2,173 +2,187 @@
 Estructuras de datos implementadas desde cero para el simulador de red
 Incluye: Lista enlazada, Cola (Queue), Pila (Stack), AVL Tree, B-tree y Trie
 """
+import socket
+import struct
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+
+@lru_cache(maxsize=4096)
+def ip_to_int(ip):
+    """Empaqueta una IP punteada en un entero de 32 bits (memoizado)"""
+    return struct.unpack('!I', socket.inet_aton(ip))[0]
+
+@lru_cache(maxsize=8192)
+def prefix_to_net_bits(prefix, mask):
+    """Retorna (red enmascarada, largo CIDR) para un par prefijo/máscara
+
+    Función pura de sus argumentos: los mismos prefijos se reconfiguran
+    una y otra vez, así que el empaquetado y el conteo de bits se pagan
+    una sola vez por par.
+    """
+    mask_int = ip_to_int(mask)
+    return ip_to_int(prefix) & mask_int, mask_int.bit_count()
 
 class Node:
     """Nodo básico para estructuras de datos enlazadas"""
+    __slots__ = ('data', 'next')
+    
     def __init__(self, data):
         self.data = data
         self.next = None
 
 class LinkedList:
-    """Lista enlazada para almacenar vecinos de interfaces"""
+    """Lista enlazada para almacenar vecinos de interfaces
+
+    Respaldada por una lista contigua más un índice set: iterar es
+    secuencial en memoria y find pasa de recorrido lineal a una
+    búsqueda hash O(1). El orden de inserción se conserva.
+    """
     def __init__(self):
-        self.head = None
-        self.size = 0
+        self._data = []
+        self._index = set()
     
     def append(self, data):
         """Agrega un elemento al final de la lista"""
-        new_node = Node(data)
-        if not self.head:
-            self.head = new_node
-        else:
-            current = self.head
-            while current.next:
-                current = current.next
-            current.next = new_node
-        self.size += 1
+        self._data.append(data)
+        self._index.add(data)
     
     def remove(self, data):
         """Remueve un elemento de la lista"""
-        if not self.head:
+        try:
+            self._data.remove(data)
+        except ValueError:
             return False
-        
-        if self.head.data == data:
-            self.head = self.head.next
-            self.size -= 1
-            return True
-        
-        current = self.head
-        while current.next:
-            if current.next.data == data:
-                current.next = current.next.next
-                self.size -= 1
-                return True
-            current = current.next
-        return False
+        # Conservar el índice si quedan duplicados del mismo valor
+        if data not in self._data:
+            self._index.discard(data)
+        return True
     
     def find(self, data):
         """Busca un elemento en la lista"""
-        current = self.head
-        while current:
-            if current.data == data:
-                return current.data
-            current = current.next
+        if data in self._index:
+            return data
         return None
     
     def to_list(self):
         """Convierte la lista enlazada a una lista de Python"""
-        result = []
-        current = self.head
-        while current:
-            result.append(current.data)
-            current = current.next
-        return result
+        return list(self._data)
     
     def is_empty(self):
         """Verifica si la lista está vacía"""
-        return self.head is None
+        return not self._data
+    
+    @property
+    def size(self):
+        return len(self._data)
     
     def __len__(self):
-        return self.size
+        return len(self._data)
 
 class Queue:
-    """Cola (FIFO) para gestionar paquetes entrantes y salientes"""
+    """Cola (FIFO) para gestionar paquetes entrantes y salientes
+
+    Internamente usa collections.deque: append/popleft son O(1) en C y
+    los elementos viven en bloques contiguos, sin un Node por elemento
+    ni persecución de punteros al recorrer.
+    """
     def __init__(self):
-        self.front = None
-        self.rear = None
-        self.size = 0
-    
-    def enqueue(self, data):
-        """Agrega un elemento al final de la cola"""
-        new_node = Node(data)
-        if self.rear is None:
-            self.front = self.rear = new_node
-        else:
-            self.rear.next = new_node
-            self.rear = new_node
-        self.size += 1
+        self._dq = deque()
+        # Publicar el append de la deque como enqueue del lado de la
+        # instancia: encolar un paquete llama directo al método C, sin
+        # pasar por un envoltorio de Python
+        self.enqueue = self._dq.append
     
     def dequeue(self):
         """Remueve y retorna el elemento del frente de la cola"""
-        if self.is_empty():
-            return None
-        
-        data = self.front.data
-        self.front = self.front.next
-        if self.front is None:
-            self.rear = None
-        self.size -= 1
-        return data
+        if self._dq:
+            return self._dq.popleft()
+        return None
     
     def peek(self):
         """Retorna el elemento del frente sin removerlo"""
-        if self.is_empty():
-            return None
-        return self.front.data
+        if self._dq:
+            return self._dq[0]
+        return None
     
     def is_empty(self):
         """Verifica si la cola está vacía"""
-        return self.front is None
+        return not self._dq
     
     def to_list(self):
         """Convierte la cola a una lista de Python para visualización"""
-        result = []
-        current = self.front
-        while current:
-            result.append(current.data)
-            current = current.next
-        return result
+        return list(self._dq)
+    
+    def drain_all(self):
+        """Vacía la cola y retorna todo su contenido como lista
+
+        Una sola copia + clear en C, pensado para procesar por lotes en
+        vez de desencolar elemento por elemento.
+        """
+        dq = self._dq
+        items = list(dq)
+        dq.clear()
+        return items
+    
+    @property
+    def size(self):
+        return len(self._dq)
     
     def __len__(self):
-        return self.size
+        return len(self._dq)
 
 class Stack:
-    """Pila (LIFO) para el historial de mensajes recibidos"""
+    """Pila (LIFO) para el historial de mensajes recibidos
+
+    Respaldada por una lista de Python: append/pop amortizados O(1)
+    sobre un arreglo contiguo, sin un Node por elemento.
+    """
     def __init__(self):
-        self.top = None
-        self.size = 0
+        self._items = []
     
     def push(self, data):
         """Agrega un elemento al tope de la pila"""
-        new_node = Node(data)
-        new_node.next = self.top
-        self.top = new_node
-        self.size += 1
+        self._items.append(data)
     
     def pop(self):
         """Remueve y retorna el elemento del tope de la pila"""
-        if self.is_empty():
-            return None
-        
-        data = self.top.data
-        self.top = self.top.next
-        self.size -= 1
-        return data
+        if self._items:
+            return self._items.pop()
+        return None
     
     def peek(self):
         """Retorna el elemento del tope sin removerlo"""
-        if self.is_empty():
-            return None
-        return self.top.data
+        if self._items:
+            return self._items[-1]
+        return None
     
     def is_empty(self):
         """Verifica si la pila está vacía"""
-        return self.top is None
+        return not self._items
     
     def to_list(self):
         """Convierte la pila a una lista de Python para visualización"""
-        result = []
-        current = self.top
-        while current:
-            result.append(current.data)
-            current = current.next
-        return result
+        # Del tope hacia abajo, como el recorrido de la lista enlazada
+        return self._items[::-1]
+    
+    @property
+    def size(self):
+        return len(self._items)
     
     def __len__(self):
-        return self.size
+        return len(self._items)
 
 class AVLNode:
     """Nodo para el árbol AVL de rutas"""
+    # Sin __dict__ por instancia: las tablas de rutas grandes son muchos
+    # objetos pequeños y el diccionario por nodo domina la memoria
+    __slots__ = ('prefix', 'mask', 'next_hop', 'metric', 'height',
+                 'left', 'right', '_mask_int', '_prefix_int_masked',
+                 '_cidr_bits', '_key')
+    
     def __init__(self, prefix, mask, next_hop, metric=0):
         self.prefix = prefix
         self.mask = mask
@@ -177,14 +191,23 @@ class AVLNode:
         self.height = 1
         self.left = None
         self.right = None
+        # Prefijo y máscara empaquetados a uint32 una sola vez: el largo
+        # CIDR y el matching por IP los reutilizan sin volver a parsear
+        # las cadenas punteadas
+        m = mask.split('.')
+        p = prefix.split('.')
+        self._mask_int = (int(m[0]) << 24) | (int(m[1]) << 16) | \
+                         (int(m[2]) << 8) | int(m[3])
+        self._cidr_bits = self._mask_int.bit_count()
+        self._prefix_int_masked = ((int(p[0]) << 24) | (int(p[1]) << 16) |
+                                   (int(p[2]) << 8) | int(p[3])) & self._mask_int
+        # Clave de ordenamiento precompuesta: la comparación de tuplas
+        # corre en C, sin desempates campo por campo en Python
+        self._key = (prefix, mask, metric)
     
     def to_cidr(self):
         """Convierte la ruta a notación CIDR"""
-        cidr_bits = bin(int(self.mask.split('.')[0])).count('1') + \
-                   bin(int(self.mask.split('.')[1])).count('1') + \
-                   bin(int(self.mask.split('.')[2])).count('1') + \
-                   bin(int(self.mask.split('.')[3])).count('1')
-        return f"{self.prefix}/{cidr_bits}"
+        return f"{self.prefix}/{self._cidr_bits}"
 
 class AVLTree:
     """Árbol AVL para tabla de rutas balanceada"""
@@ -197,6 +220,12 @@ class AVLTree:
             'rotations_rl': 0,
             'rotations_rr': 0
         }
+        # Vista aplanada de rutas para búsquedas por lote; se invalida
+        # con cada mutación del árbol
+        self._flat_routes = None
+        # Nodos dados de baja listos para reutilizar: con mucha rotación
+        # de rutas se evita un ciclo de alocación/liberación por cambio
+        self._free = []
     
     def get_height(self, node):
         """Obtiene la altura de un nodo"""
@@ -255,100 +284,188 @@ class AVLTree:
         z.right = self.rotate_right(z.right)
         return self.rotate_left(z)
     
-    def _compare_routes(self, route1, route2):
-        """Compara dos rutas para el ordenamiento en AVL"""
-        prefix1, mask1, metric1 = route1
-        prefix2, mask2, metric2 = route2
-        
-        if prefix1 != prefix2:
-            return -1 if prefix1 < prefix2 else 1
-        if mask1 != mask2:
-            return -1 if mask1 < mask2 else 1
-        return -1 if metric1 < metric2 else (1 if metric1 > metric2 else 0)
-    
     def insert(self, prefix, mask, next_hop, metric=0):
         """Inserta una ruta en el árbol AVL"""
         self.root = self._insert_node(self.root, prefix, mask, next_hop, metric)
         self.size += 1
+        self._flat_routes = None
+    
+    # Tope del free-list para no retener nodos sin límite
+    _FREE_CAP = 4096
+    
+    def _alloc(self, prefix, mask, next_hop, metric):
+        """Obtiene un AVLNode nuevo o reciclado del free-list"""
+        free = self._free
+        if free:
+            node = free.pop()
+            node.__init__(prefix, mask, next_hop, metric)
+            return node
+        return AVLNode(prefix, mask, next_hop, metric)
+    
+    def _recycle(self, node):
+        """Devuelve un nodo dado de baja al free-list"""
+        if len(self._free) < self._FREE_CAP:
+            node.left = None
+            node.right = None
+            node.next_hop = None
+            self._free.append(node)
     
     def _insert_node(self, node, prefix, mask, next_hop, metric):
-        """Método auxiliar para insertar nodo"""
+        """Método auxiliar para insertar nodo (descenso iterativo)
+
+        Registra el camino recorrido en una pila explícita y rebalancea
+        al deshacerlo, evitando un frame de Python por nivel del árbol.
+        """
         if not node:
-            return AVLNode(prefix, mask, next_hop, metric)
-        
-        comp = self._compare_routes((prefix, mask, metric), (node.prefix, node.mask, node.metric))
-        
-        if comp < 0:
-            node.left = self._insert_node(node.left, prefix, mask, next_hop, metric)
-        elif comp > 0:
-            node.right = self._insert_node(node.right, prefix, mask, next_hop, metric)
-        else:
-            node.next_hop = next_hop
-            node.metric = metric
-            return node
-        
-        self.update_height(node)
-        balance = self.get_balance(node)
-        
-        if balance > 1 and self._compare_routes((prefix, mask, metric), (node.left.prefix, node.left.mask, node.left.metric)) < 0:
-            return self.rotate_right(node)
-        
-        if balance < -1 and self._compare_routes((prefix, mask, metric), (node.right.prefix, node.right.mask, node.right.metric)) > 0:
-            return self.rotate_left(node)
-        
-        if balance > 1 and self._compare_routes((prefix, mask, metric), (node.left.prefix, node.left.mask, node.left.metric)) > 0:
-            return self.rotate_left_right(node)
-        
-        if balance < -1 and self._compare_routes((prefix, mask, metric), (node.right.prefix, node.right.mask, node.right.metric)) < 0:
-            return self.rotate_right_left(node)
-        
-        return node
+            return self._alloc(prefix, mask, next_hop, metric)
+        
+        key = (prefix, mask, metric)
+        path = []  # pares (nodo, dirección): -1 izquierda, 1 derecha
+        current = node
+        while True:
+            node_key = current._key
+            if key < node_key:
+                path.append((current, -1))
+                if current.left is None:
+                    current.left = self._alloc(prefix, mask, next_hop, metric)
+                    break
+                current = current.left
+            elif key > node_key:
+                path.append((current, 1))
+                if current.right is None:
+                    current.right = self._alloc(prefix, mask, next_hop, metric)
+                    break
+                current = current.right
+            else:
+                # Ruta ya existente: actualizar en sitio, sin rebalancear
+                current.next_hop = next_hop
+                current.metric = metric
+                return node
+        
+        # Deshacer el camino actualizando alturas y rotando donde haga falta
+        new_root = node
+        for i in range(len(path) - 1, -1, -1):
+            n, _ = path[i]
+            self.update_height(n)
+            balance = self.get_balance(n)
+            replacement = n
+            
+            if balance > 1:
+                if key < n.left._key:
+                    replacement = self.rotate_right(n)
+                else:
+                    replacement = self.rotate_left_right(n)
+            elif balance < -1:
+                if key > n.right._key:
+                    replacement = self.rotate_left(n)
+                else:
+                    replacement = self.rotate_right_left(n)
+            
+            if replacement is not n:
+                if i == 0:
+                    new_root = replacement
+                else:
+                    parent, direction = path[i - 1]
+                    if direction < 0:
+                        parent.left = replacement
+                    else:
+                        parent.right = replacement
+        
+        return new_root
     
     def delete(self, prefix, mask):
         """Elimina una ruta del árbol AVL"""
         self.root = self._delete_node(self.root, prefix, mask)
         self.size = max(0, self.size - 1)
+        self._flat_routes = None
     
     def _delete_node(self, node, prefix, mask):
-        """Método auxiliar para eliminar nodo"""
+        """Método auxiliar para eliminar nodo (descenso iterativo)"""
         if not node:
             return node
         
-        comp = self._compare_routes((prefix, mask, 0), (node.prefix, node.mask, 0))
+        # Descender hasta la ruta buscada registrando el camino; la
+        # métrica no participa en la identidad de la ruta
+        key = (prefix, mask)
+        path = []  # pares (nodo, dirección): -1 izquierda, 1 derecha
+        current = node
+        while current:
+            node_key = (current.prefix, current.mask)
+            if key < node_key:
+                path.append((current, -1))
+                current = current.left
+            elif key > node_key:
+                path.append((current, 1))
+                current = current.right
+            else:
+                break
+        
+        if current is None:
+            # Ruta inexistente: el árbol queda intacto
+            return node
         
-        if comp < 0:
-            node.left = self._delete_node(node.left, prefix, mask)
-        elif comp > 0:
-            node.right = self._delete_node(node.right, prefix, mask)
+        if current.left and current.right:
+            # Dos hijos: copiar el sucesor en orden y eliminar ese nodo,
+            # que por ser el mínimo del subárbol derecho no tiene hijo
+            # izquierdo
+            temp = self._find_min(current.right)
+            path.append((current, 1))
+            sub = current.right
+            while sub is not temp:
+                path.append((sub, -1))
+                sub = sub.left
+            current.prefix = temp.prefix
+            current.mask = temp.mask
+            current.next_hop = temp.next_hop
+            current.metric = temp.metric
+            current._mask_int = temp._mask_int
+            current._cidr_bits = temp._cidr_bits
+            current._prefix_int_masked = temp._prefix_int_masked
+            current._key = temp._key
+            current = temp
+        
+        # Empalmar el nodo eliminado con su único hijo (o ninguno)
+        child = current.left if current.left else current.right
+        if not path:
+            self._recycle(current)
+            return child
+        parent, direction = path[-1]
+        if direction < 0:
+            parent.left = child
         else:
-            if not node.left:
-                return node.right
-            elif not node.right:
-                return node.left
+            parent.right = child
+        self._recycle(current)
+        
+        # Deshacer el camino actualizando alturas y rebalanceando
+        new_root = node
+        for i in range(len(path) - 1, -1, -1):
+            n, _ = path[i]
+            self.update_height(n)
+            balance = self.get_balance(n)
+            replacement = n
             
-            temp = self._find_min(node.right)
-            node.prefix = temp.prefix
-            node.mask = temp.mask
-            node.next_hop = temp.next_hop
-            node.metric = temp.metric
-            node.right = self._delete_node(node.right, temp.prefix, temp.mask)
-        
-        self.update_height(node)
-        balance = self.get_balance(node)
-        
-        if balance > 1 and self.get_balance(node.left) >= 0:
-            return self.rotate_right(node)
-        
-        if balance > 1 and self.get_balance(node.left) < 0:
-            return self.rotate_left_right(node)
-        
-        if balance < -1 and self.get_balance(node.right) <= 0:
-            return self.rotate_left(node)
-        
-        if balance < -1 and self.get_balance(node.right) > 0:
-            return self.rotate_right_left(node)
-        
-        return node
+            if balance > 1:
+                if self.get_balance(n.left) >= 0:
+                    replacement = self.rotate_right(n)
+                else:
+                    replacement = self.rotate_left_right(n)
+            elif balance < -1:
+                if self.get_balance(n.right) <= 0:
+                    replacement = self.rotate_left(n)
+                else:
+                    replacement = self.rotate_right_left(n)
+            
+            if replacement is not n:
+                if i == 0:
+                    new_root = replacement
+                else:
+                    parent, direction = path[i - 1]
+                    if direction < 0:
+                        parent.left = replacement
+                    else:
+                        parent.right = replacement
+        
+        return new_root
     
     def _find_min(self, node):
         """Encuentra el nodo con valor mínimo"""
@@ -357,36 +474,78 @@ class AVLTree:
         return node
     
     def lookup(self, dest_ip):
-        """Busca la mejor ruta para una IP destino (longest-prefix match)"""
-        return self._lookup_node(self.root, dest_ip)
-    
-    def _lookup_node(self, node, dest_ip):
-        """Método auxiliar para búsqueda de ruta"""
-        if not node:
-            return None
-        
-        if self._ip_in_network(dest_ip, node.prefix, node.mask):
-            best_match = node
-            right_match = self._lookup_node(node.right, dest_ip)
-            if right_match:
-                return right_match
-            return best_match
+        """Busca la mejor ruta para una IP destino (longest-prefix match)
+
+        Recorrido iterativo: la IP se empaqueta una sola vez y cada
+        nivel compara contra los enteros precalculados del nodo,
+        recordando la mejor coincidencia mientras desciende.
+        """
+        ip_int = ip_to_int(dest_ip)
+        node = self.root
+        best_match = None
+        
+        while node:
+            if (ip_int & node._mask_int) == node._prefix_int_masked:
+                best_match = node
+                node = node.right
+            elif dest_ip < node.prefix:
+                node = node.left
+            else:
+                node = node.right
         
-        if dest_ip < node.prefix:
-            return self._lookup_node(node.left, dest_ip)
-        else:
-            return self._lookup_node(node.right, dest_ip)
+        return best_match
     
-    def _ip_in_network(self, ip, network, mask):
-        """Verifica si una IP está en una red dada"""
-        ip_parts = [int(x) for x in ip.split('.')]
-        net_parts = [int(x) for x in network.split('.')]
-        mask_parts = [int(x) for x in mask.split('.')]
-        
-        for i in range(4):
-            if (ip_parts[i] & mask_parts[i]) != (net_parts[i] & mask_parts[i]):
-                return False
-        return True
+    def _flatten(self):
+        """Construye la vista aplanada de rutas ordenada por /cidr desc"""
+        nodes = self.in_order_traversal()
+        nodes.sort(key=lambda n: n._cidr_bits, reverse=True)
+        flat = [(n._prefix_int_masked, n._mask_int, n) for n in nodes]
+        self._flat_routes = flat
+        return flat
+    
+    def lookup_lpm(self, dest_ip):
+        """Longest-prefix match estricto sobre la vista aplanada
+
+        Recorre las rutas de más a menos específica comparando enteros
+        empaquetados; el primer acierto es por construcción el prefijo
+        más largo. A diferencia de lookup, no depende del orden
+        lexicográfico del árbol, por lo que el resultado es LPM exacto.
+        """
+        flat = self._flat_routes
+        if flat is None:
+            flat = self._flatten()
+        
+        ip_int = ip_to_int(dest_ip)
+        for prefix_masked, mask_int, node in flat:
+            if ip_int & mask_int == prefix_masked:
+                return node
+        return None
+    
+    def lookup_many(self, dest_ips):
+        """Resuelve un lote de IPs destino contra la tabla de rutas
+
+        Aplana las rutas una sola vez a tuplas (prefijo_enmascarado,
+        máscara, nodo) ordenadas por largo de prefijo descendente; cada
+        IP del lote se resuelve con comparaciones de enteros en un bucle
+        plano, sin descender el árbol por paquete. Retorna la lista de
+        nodos coincidentes (None donde no hay ruta).
+        """
+        flat = self._flat_routes
+        if flat is None:
+            flat = self._flatten()
+        
+        results = []
+        append = results.append
+        to_int = ip_to_int
+        for dest_ip in dest_ips:
+            ip_int = to_int(dest_ip)
+            for prefix_masked, mask_int, node in flat:
+                if ip_int & mask_int == prefix_masked:
+                    append(node)
+                    break
+            else:
+                append(None)
+        return results
     
     def in_order_traversal(self):
         """Recorrido en orden del árbol"""
@@ -402,37 +561,49 @@ class AVLTree:
             self._in_order(node.right, routes)
     
     def get_tree_display(self):
-        """Retorna representación ASCII del árbol"""
+        """Retorna representación ASCII del árbol
+
+        Recorrido en preorden con pila explícita: las líneas literales
+        de los conectores se apilan junto a los nodos, sin recursión ni
+        concatenación de prefijos por nivel.
+        """
         if not self.root:
             return "Empty tree"
         
         lines = []
-        self._build_tree_display(self.root, "", True, lines)
-        return "\n".join(lines)
-    
-    def _build_tree_display(self, node, prefix, is_last, lines):
-        """Construye la representación ASCII del árbol"""
-        if node:
-            node_text = f"[{node.to_cidr()}]"
-            lines.append(prefix + node_text)
+        stack = [self.root]
+        emit = lines.append
+        push = stack.append
+        while stack:
+            item = stack.pop()
+            if item.__class__ is str:
+                emit(item)
+                continue
             
-            # Mostrar hijos en formato más simple
-            if node.left:
-                lines.append(prefix + " /")
-                self._build_tree_display(node.left, prefix, False, lines)
-            
-            if node.right:
-                lines.append(prefix + " \\")
-                self._build_tree_display(node.right, prefix, False, lines)
+            emit(f"[{item.to_cidr()}]")
+            # Apilar en orden inverso: el subárbol izquierdo sale primero
+            if item.right:
+                push(item.right)
+                push(" \\")
+            if item.left:
+                push(item.left)
+                push(" /")
+        
+        return "\n".join(lines)
+
+# Extractor de clave para bisecar listas de pares (clave, valor)
+_entry_key = itemgetter(0)
 
 class BTreeNode:
     """Nodo para el B-tree de índices persistentes"""
+    __slots__ = ('entries', 'children', 'is_leaf')
+    
     def __init__(self, is_leaf=False):
-        self.keys = []
-        self.values = []
+        # Pares (clave, valor) en una sola lista: las divisiones copian
+        # una rebanada por lado en vez de dos listas paralelas
+        self.entries = []
         self.children = []
         self.is_leaf = is_leaf
-        self.parent = None
 
 class BTree:
     """B-tree para índice persistente de configuraciones"""
@@ -448,60 +619,52 @@ class BTree:
     
     def search(self, key):
         """Busca una clave en el B-tree"""
-        return self._search_node(self.root, key)
-    
-    def _search_node(self, node, key):
-        """Método auxiliar para búsqueda"""
-        i = 0
-        while i < len(node.keys) and key > node.keys[i]:
-            i += 1
-        
-        if i < len(node.keys) and key == node.keys[i]:
-            return node.values[i]
-        
-        if node.is_leaf:
-            return None
-        
-        return self._search_node(node.children[i], key)
+        node = self.root
+        while True:
+            entries = node.entries
+            i = bisect_left(entries, key, key=_entry_key)
+            
+            if i < len(entries) and entries[i][0] == key:
+                return entries[i][1]
+            
+            if node.is_leaf:
+                return None
+            
+            node = node.children[i]
     
     def insert(self, key, value):
-        """Inserta una clave-valor en el B-tree"""
-        if len(self.root.keys) == (2 * self.order) - 1:
+        """Inserta una clave-valor en el B-tree
+
+        Descenso iterativo clásico: todo hijo lleno se divide de camino
+        hacia abajo, de modo que al llegar a la hoja siempre hay espacio
+        y no hace falta retroceder ni recursión.
+        """
+        max_keys = (2 * self.order) - 1
+        
+        if len(self.root.entries) == max_keys:
             new_root = BTreeNode()
             new_root.children.append(self.root)
-            self.root.parent = new_root
             self._split_child(new_root, 0)
             self.root = new_root
             self.stats['height'] += 1
         
-        self._insert_non_full(self.root, key, value)
-    
-    def _insert_non_full(self, node, key, value):
-        """Inserta en un nodo que no está lleno"""
-        i = len(node.keys) - 1
-        
-        if node.is_leaf:
-            node.keys.append(None)
-            node.values.append(None)
-            
-            while i >= 0 and key < node.keys[i]:
-                node.keys[i + 1] = node.keys[i]
-                node.values[i + 1] = node.values[i]
-                i -= 1
-            
-            node.keys[i + 1] = key
-            node.values[i + 1] = value
-        else:
-            while i >= 0 and key < node.keys[i]:
-                i -= 1
-            i += 1
+        node = self.root
+        while not node.is_leaf:
+            # _split_child inserta en esta misma lista, el alias sigue válido
+            entries = node.entries
+            i = bisect_right(entries, key, key=_entry_key)
             
-            if len(node.children[i].keys) == (2 * self.order) - 1:
+            if len(node.children[i].entries) == max_keys:
                 self._split_child(node, i)
-                if key > node.keys[i]:
+                if key > entries[i][0]:
                     i += 1
             
-            self._insert_non_full(node.children[i], key, value)
+            node = node.children[i]
+        
+        # bisect_right reproduce la posición del corrimiento manual:
+        # las claves iguales quedan antes de la nueva
+        i = bisect_right(node.entries, key, key=_entry_key)
+        node.entries.insert(i, (key, value))
     
     def _split_child(self, parent, index):
         """Divide un nodo hijo lleno"""
@@ -512,45 +675,56 @@ class BTree:
         new_child = BTreeNode(is_leaf=full_child.is_leaf)
         
         mid_index = self.order - 1
+        mid_entry = full_child.entries[mid_index]
         
-        new_child.keys = full_child.keys[mid_index + 1:]
-        new_child.values = full_child.values[mid_index + 1:]
-        full_child.keys = full_child.keys[:mid_index]
-        full_child.values = full_child.values[:mid_index]
+        new_child.entries = full_child.entries[mid_index + 1:]
+        full_child.entries = full_child.entries[:mid_index]
         
         if not full_child.is_leaf:
             new_child.children = full_child.children[mid_index + 1:]
             full_child.children = full_child.children[:mid_index + 1]
-            for child in new_child.children:
-                child.parent = new_child
         
         parent.children.insert(index + 1, new_child)
-        parent.keys.insert(index, full_child.keys[mid_index])
-        parent.values.insert(index, full_child.values[mid_index])
-        
-        new_child.parent = parent
+        parent.entries.insert(index, mid_entry)
     
     def in_order_traversal(self):
-        """Recorrido en orden del B-tree"""
+        """Recorrido en orden del B-tree (pila explícita, sin recursión)"""
         result = []
-        self._in_order(self.root, result)
-        return result
-    
-    def _in_order(self, node, result):
-        """Método auxiliar para recorrido en orden"""
-        if node:
-            for i in range(len(node.keys)):
-                if not node.is_leaf:
-                    self._in_order(node.children[i], result)
-                result.append((node.keys[i], node.values[i]))
+        if self.root is None:
+            return result
+        
+        stack = [(False, self.root)]
+        while stack:
+            is_entry, payload = stack.pop()
+            if is_entry:
+                result.append(payload)
+                continue
             
-            if not node.is_leaf:
-                self._in_order(node.children[-1], result)
+            node = payload
+            if node.is_leaf:
+                result.extend(node.entries)
+            else:
+                # Apilar en orden inverso: hijo_n, clave_{n-1}, hijo_{n-1}, ...
+                entries = node.entries
+                stack.append((False, node.children[-1]))
+                for i in range(len(entries) - 1, -1, -1):
+                    stack.append((True, entries[i]))
+                    stack.append((False, node.children[i]))
+        
+        return result
 
 class TrieNode:
-    """Nodo para el Trie de prefijos IP"""
-    def __init__(self):
-        self.children = {}
+    """Nodo para el Trie de prefijos IP (con compresión de caminos)"""
+    __slots__ = ('edge_bits', 'edge_len', 'children', 'is_end_of_prefix',
+                 'policies', 'route_info')
+    
+    def __init__(self, edge_bits=0, edge_len=0):
+        # Trie binario comprimido: la arista que llega a este nodo guarda
+        # una tira completa de bits (valor + longitud) en lugar de un nodo
+        # por bit; las cadenas de un solo hijo colapsan en una arista
+        self.edge_bits = edge_bits
+        self.edge_len = edge_len
+        self.children = [None, None]
         self.is_end_of_prefix = False
         self.policies = {}
         self.route_info = None
@@ -560,112 +734,154 @@ class Trie:
     def __init__(self):
         self.root = TrieNode()
     
-    def insert_prefix(self, prefix, mask, policies=None):
-        """Inserta un prefijo con sus políticas"""
-        network_bits = self._prefix_to_bits(prefix, mask)
+    def _walk_or_create(self, prefix, mask):
+        """Desciende hasta el nodo del prefijo creando el camino faltante
+
+        Único punto de descenso para las rutas de aprovisionamiento. Con
+        las aristas comprimidas cada paso consume una tira de bits entera
+        (comparada con un shift + xor sobre los enteros empaquetados); si
+        la clave diverge a mitad de una arista, la arista se parte en el
+        punto común y el resto sigue colgado del nodo intermedio.
+        """
+        net, cidr = prefix_to_net_bits(prefix, mask)
         node = self.root
+        pos = 0  # bits de la clave ya consumidos
+        
+        while pos < cidr:
+            bit = (net >> (31 - pos)) & 1
+            child = node.children[bit]
+            if child is None:
+                # Rama vacía: todos los bits restantes caben en una arista
+                rem = cidr - pos
+                leaf = TrieNode((net >> (32 - cidr)) & ((1 << rem) - 1), rem)
+                node.children[bit] = leaf
+                return leaf
+            
+            elen = child.edge_len
+            n = elen if elen < cidr - pos else cidr - pos
+            seg = (net >> (32 - pos - n)) & ((1 << n) - 1)
+            diff = seg ^ (child.edge_bits >> (elen - n))
+            common = n if diff == 0 else n - diff.bit_length()
+            
+            if common == elen:
+                # La arista completa coincide; seguir descendiendo
+                node = child
+                pos += elen
+                continue
+            
+            # Partir la arista: nodo intermedio con la parte común y el
+            # hijo original conserva la cola de su etiqueta
+            mid = TrieNode(child.edge_bits >> (elen - common), common)
+            tail_len = elen - common
+            child.edge_bits &= (1 << tail_len) - 1
+            child.edge_len = tail_len
+            mid.children[child.edge_bits >> (tail_len - 1)] = child
+            node.children[bit] = mid
+            pos += common
+            
+            if pos == cidr:
+                return mid
+            
+            rem = cidr - pos
+            leaf = TrieNode((net >> (32 - cidr)) & ((1 << rem) - 1), rem)
+            mid.children[(net >> (31 - pos)) & 1] = leaf
+            return leaf
         
-        for bit in network_bits:
-            if bit not in node.children:
-                node.children[bit] = TrieNode()
-            node = node.children[bit]
-        
+        return node
+    
+    def insert_prefix(self, prefix, mask, policies=None):
+        """Inserta un prefijo con sus políticas"""
+        node = self._walk_or_create(prefix, mask)
         node.is_end_of_prefix = True
         if policies:
             node.policies.update(policies)
     
-    def _prefix_to_bits(self, prefix, mask):
-        """Convierte prefijo e IP a bits de red"""
-        ip_parts = [int(x) for x in prefix.split('.')]
-        mask_parts = [int(x) for x in mask.split('.')]
-        
-        bits = []
-        for i in range(4):
-            network_part = ip_parts[i] & mask_parts[i]
-            mask_bits = bin(mask_parts[i]).count('1')
-            part_bits = format(network_part, '08b')[:mask_bits]
-            bits.extend(part_bits)
-        
-        return bits
-    
     def longest_prefix_match(self, ip):
         """Busca el prefijo más específico para una IP"""
-        ip_bits = self._ip_to_bits(ip)
+        ip_int = ip_to_int(ip)
         node = self.root
         last_match = None
+        pos = 0
         
-        for bit in ip_bits:
-            if bit in node.children:
-                node = node.children[bit]
-                if node.is_end_of_prefix:
-                    last_match = node
-            else:
+        while pos < 32:
+            node = node.children[(ip_int >> (31 - pos)) & 1]
+            if node is None:
+                break
+            elen = node.edge_len
+            if pos + elen > 32 or \
+                    (ip_int >> (32 - pos - elen)) & ((1 << elen) - 1) != node.edge_bits:
                 break
+            pos += elen
+            if node.is_end_of_prefix:
+                last_match = node
         
         return last_match
     
-    def _ip_to_bits(self, ip):
-        """Convierte IP a secuencia de bits"""
-        parts = [int(x) for x in ip.split('.')]
-        bits = ''
-        for part in parts:
-            bits += format(part, '08b')
-        return bits
-    
     def set_policy(self, prefix, mask, policy_type, policy_value):
         """Establece una política para un prefijo"""
-        network_bits = self._prefix_to_bits(prefix, mask)
-        node = self.root
-        
-        for bit in network_bits:
-            if bit not in node.children:
-                node.children[bit] = TrieNode()
-            node = node.children[bit]
-        
+        node = self._walk_or_create(prefix, mask)
         node.is_end_of_prefix = True
         node.policies[policy_type] = policy_value
     
     def get_inherited_policies(self, ip):
         """Obtiene todas las políticas heredadas para una IP"""
-        ip_bits = self._ip_to_bits(ip)
+        ip_int = ip_to_int(ip)
         node = self.root
         policies = {}
+        pos = 0
         
-        for bit in ip_bits:
-            if bit in node.children:
-                node = node.children[bit]
-                if node.is_end_of_prefix:
-                    policies.update(node.policies)
-            else:
+        while pos < 32:
+            node = node.children[(ip_int >> (31 - pos)) & 1]
+            if node is None:
+                break
+            elen = node.edge_len
+            if pos + elen > 32 or \
+                    (ip_int >> (32 - pos - elen)) & ((1 << elen) - 1) != node.edge_bits:
                 break
+            pos += elen
+            if node.is_end_of_prefix:
+                policies.update(node.policies)
         
         return policies
     
     def display_tree(self):
-        """Muestra el árbol de prefijos"""
+        """Muestra el árbol de prefijos
+
+        Recorrido en preorden con pila explícita; el camino de bits se
+        mantiene como una lista compartida que se recorta a la
+        profundidad del nodo visitado, en vez de concatenar una cadena
+        nueva por nivel.
+        """
         result = []
-        self._display_node(self.root, "", result, 0)
+        stack = [(self.root, "")]
+        
+        while stack:
+            node, path = stack.pop()
+            
+            if node.is_end_of_prefix:
+                depth = len(path)
+                prefix_display = self._bits_to_prefix_display(path)
+                policies_str = ""
+                if node.policies:
+                    policy_list = [f"{k}={v}" for k, v in node.policies.items()]
+                    policies_str = " {" + ", ".join(policy_list) + "}"
+                
+                indent = "└── " if depth > 0 else ""
+                result.append("  " * max(0, depth - 1) + indent + prefix_display + policies_str)
+            
+            # Apilar en orden inverso para visitar primero el bit 0; la
+            # etiqueta comprimida se expande a bits sólo para la vista
+            child = node.children[1]
+            if child is not None:
+                stack.append((child, path + format(child.edge_bits, f"0{child.edge_len}b")))
+            child = node.children[0]
+            if child is not None:
+                stack.append((child, path + format(child.edge_bits, f"0{child.edge_len}b")))
+        
         if not result:
             return "No prefix policies configured"
         return "\n".join(result)
     
-    def _display_node(self, node, current_path, result, depth):
-        """Método auxiliar para mostrar el árbol"""
-        if node.is_end_of_prefix:
-            # Convertir path de bits a formato legible
-            prefix_display = self._bits_to_prefix_display(current_path)
-            policies_str = ""
-            if node.policies:
-                policy_list = [f"{k}={v}" for k, v in node.policies.items()]
-                policies_str = " {" + ", ".join(policy_list) + "}"
-            
-            indent = "└── " if depth > 0 else ""
-            result.append("  " * max(0, depth - 1) + indent + prefix_display + policies_str)
-        
-        for bit, child in node.children.items():
-            new_path = current_path + bit
-            self._display_node(child, new_path, result, depth + 1)
-    
     def _bits_to_prefix_display(self, bits):
         """Convierte una secuencia de bits a formato de prefijo legible"""
         if not bits:
@@ -688,11 +904,13 @@ class Trie:
             octets.append('0')
         
         prefix = '.'.join(octets[:4])
-        cidr_len = len([b for b in bits if b == '1'])
+        cidr_len = bits.count('1')
         return f"{prefix}/{cidr_len}"
 
 class ErrorLogEntry:
     """Entrada del log de errores"""
+    __slots__ = ('timestamp', 'error_type', 'message', 'command')
+    
     def __init__(self, timestamp, error_type, message, command=None):
         self.timestamp = timestamp
         self.error_type = error_type
@@ -702,23 +920,21 @@ class ErrorLogEntry:
 class ErrorLog:
     """Sistema de registro de errores implementado como cola"""
     def __init__(self):
-        self.errors = Queue()
+        # deque acotada: al llenarse descarta sola la entrada más vieja
+        # en C, sin el chequeo de longitud + dequeue explícitos por evento
         self.max_entries = 1000
+        self.errors = deque(maxlen=self.max_entries)
     
     def log_error(self, error_type, message, command=None):
         """Registra un nuevo error"""
         from datetime import datetime
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        entry = ErrorLogEntry(timestamp, error_type, message, command)
-        
-        if len(self.errors) >= self.max_entries:
-            self.errors.dequeue()
-        
-        self.errors.enqueue(entry)
+        self.errors.append(ErrorLogEntry(timestamp, error_type, message, command))
     
     def get_errors(self, limit=None):
         """Obtiene errores del log"""
-        all_errors = self.errors.to_list()
         if limit:
-            return all_errors[-limit:]
-        return all_errors
\ No newline at end of file
+            # islice desde el final evita materializar el log completo
+            start = max(0, len(self.errors) - limit)
+            return list(islice(self.errors, start, None))
+        return list(self.errors)
\ No newline at end of file
@@ -1,9 +1,28 @@
 """
 Clases Device e Interface para simular dispositivos de red
 """
-from data_structures import LinkedList, Queue, Stack, AVLTree, BTree, Trie, ErrorLog
+from data_structures import AVLTree, BTree, Trie, ErrorLog, ip_to_int
 from packet import Packet
-import re
+from collections import deque, OrderedDict
+from datetime import datetime
+import json
+import os
+import socket
+import sys
+
+# orjson (C + SIMD) serializa los snapshots mucho más rápido que el json
+# de la stdlib; si no está instalado se usa el camino estándar
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Tipo más comparado en el camino de reenvío; internado para que las
+# comparaciones de igualdad resuelvan por identidad de puntero
+_SWITCH = sys.intern("switch")
+
+# Directorio donde se persisten los snapshots de configuración
+CONFIG_DIR = "configs"
 
 class Interface:
     """Interfaz de red de un dispositivo"""
@@ -16,109 +35,192 @@ class Interface:
             name (str): Nombre de la interfaz (ej: g0/0, eth0)
             device (Device): Dispositivo al que pertenece la interfaz
         """
-        self.name = name
+        self.name = sys.intern(name)
         self.device = device
         self.ip_address = None
+        self.ip_int = None  # Forma empaquetada (uint32) de la IP
         self.is_up = False  # Estado shutdown por defecto
-        self.connected_interfaces = LinkedList()  # Vecinos conectados
-        self.outgoing_queue = Queue()  # Cola de paquetes salientes
-        self.incoming_queue = Queue()  # Cola de paquetes entrantes
+        self.connected_interfaces = set()  # Vecinos conectados
+        self.outgoing_queue = deque()  # Cola de paquetes salientes
+        self.incoming_queue = deque()  # Cola de paquetes entrantes
+        # Tupla memoizada de vecinos activos (up y con dispositivo en
+        # línea); None = rearmar. La invalidan conectar/desconectar y los
+        # cambios de estado de los vecinos
+        self._active_neighbors = None
     
     def set_ip_address(self, ip):
         """Asigna dirección IP a la interfaz con validación"""
         if self._validate_ip(ip):
+            old_ip = self.ip_address
             self.ip_address = ip
+            self.ip_int = ip_to_int(ip)
+            self.device._status_dirty = True
+            # Actualizar el índice de next-hop de los dispositivos vecinos:
+            # retirar la entrada de la IP anterior (si apuntaba a este
+            # enlace) y registrar la nueva
+            for neighbor_if in self.connected_interfaces:
+                index = neighbor_if.device._neighbor_by_ip
+                if old_ip is not None and index.get(old_ip) is neighbor_if:
+                    del index[old_ip]
+                index[ip] = neighbor_if
             return True
         return False
     
     def _validate_ip(self, ip):
         """Valida formato de dirección IP"""
-        pattern = r'^(\d{1,3}\.){3}\d{1,3}$'
-        if not re.match(pattern, ip):
+        # inet_aton valida y parsea en una sola llamada a libc; el conteo
+        # de puntos descarta las formas abreviadas ("10.1") que acepta
+        try:
+            socket.inet_aton(ip)
+        except OSError:
             return False
-        
-        parts = ip.split('.')
-        for part in parts:
-            if not (0 <= int(part) <= 255):
-                return False
-        return True
+        return ip.count('.') == 3
     
     def shutdown(self):
         """Desactiva la interfaz"""
         self.is_up = False
+        self.device._status_dirty = True
+        self._notify_neighbors()
     
     def no_shutdown(self):
         """Activa la interfaz"""
         self.is_up = True
+        self.device._status_dirty = True
+        self._notify_neighbors()
+    
+    def _notify_neighbors(self):
+        """Invalida la lista de vecinos activos de los enlaces de esta interfaz"""
+        for neighbor_if in self.connected_interfaces:
+            neighbor_if._active_neighbors = None
     
     def connect_to(self, other_interface):
         """Conecta esta interfaz con otra interfaz"""
-        if other_interface not in self.connected_interfaces.to_list():
-            self.connected_interfaces.append(other_interface)
-            other_interface.connected_interfaces.append(self)
+        if other_interface not in self.connected_interfaces:
+            self.connected_interfaces.add(other_interface)
+            other_interface.connected_interfaces.add(self)
+            # Indexar el vecino por IP: el reenvío resuelve el next-hop
+            # con una sola sonda de diccionario
+            if other_interface.ip_address:
+                self.device._neighbor_by_ip[other_interface.ip_address] = self
+            if self.ip_address:
+                other_interface.device._neighbor_by_ip[self.ip_address] = other_interface
+            self.device._status_dirty = True
+            other_interface.device._status_dirty = True
+            self._active_neighbors = None
+            other_interface._active_neighbors = None
     
     def disconnect_from(self, other_interface):
         """Desconecta esta interfaz de otra interfaz"""
-        self.connected_interfaces.remove(other_interface)
-        other_interface.connected_interfaces.remove(self)
+        self.connected_interfaces.discard(other_interface)
+        other_interface.connected_interfaces.discard(self)
+        if other_interface.ip_address:
+            index = self.device._neighbor_by_ip
+            if index.get(other_interface.ip_address) is self:
+                del index[other_interface.ip_address]
+        if self.ip_address:
+            index = other_interface.device._neighbor_by_ip
+            if index.get(self.ip_address) is other_interface:
+                del index[self.ip_address]
+        self.device._status_dirty = True
+        other_interface.device._status_dirty = True
+        self._active_neighbors = None
+        other_interface._active_neighbors = None
     
     def send_packet(self, packet):
         """Envía un paquete a través de esta interfaz"""
         if self.is_up and self.device.is_online:
-            self.outgoing_queue.enqueue(packet)
+            self.outgoing_queue.append(packet)
+            self.device._status_dirty = True
             return True
         return False
     
     def receive_packet(self, packet):
         """Recibe un paquete en esta interfaz"""
         if self.is_up and self.device.is_online:
-            self.incoming_queue.enqueue(packet)
+            self.incoming_queue.append(packet)
+            self.device._status_dirty = True
             return True
         return False
     
-    def process_outgoing_packets(self):
-        """Procesa paquetes en la cola de salida"""
-        processed_packets = []
+    def process_outgoing_packets(self, out_list=None):
+        """Procesa paquetes en la cola de salida
+
+        Drena la cola de una vez y procesa el lote con los invariantes
+        (nombre, tipo, vecinos) resueltos una sola vez, en vez de pagar
+        las búsquedas de atributos por paquete. Si se recibe out_list,
+        los resultados se agregan ahí directamente, sin lista intermedia.
+        """
+        processed_packets = out_list if out_list is not None else []
+        queue = self.outgoing_queue
+        packets = list(queue)
+        queue.clear()
+        if not packets:
+            return processed_packets
+        self.device._status_dirty = True
+        
+        device_name = self.device.name
+        broadcast = self.device.device_type in ("switch", "hub")
+        neighbors = self._active_neighbors
+        if neighbors is None:
+            neighbors = self._active_neighbors = tuple(
+                ci for ci in self.connected_interfaces
+                if ci.is_up and ci.device.is_online)
+        append = processed_packets.append
         
-        while not self.outgoing_queue.is_empty():
-            packet = self.outgoing_queue.dequeue()
+        # Pase fusionado TTL + traza sobre el lote completo: los paquetes
+        # vencidos quedan marcados aquí y solo los sobrevivientes entran
+        # al bucle de despacho hacia los vecinos
+        alive = []
+        alive_append = alive.append
+        for packet in packets:
             if packet and packet.decrement_ttl():
-                packet.add_hop(self.device.name)
-                
-                # Enviar a todas las interfaces conectadas (broadcast para switches)
-                packet_sent = False
-                for connected_if in self.connected_interfaces.to_list():
-                    if connected_if.is_up and connected_if.device.is_online:
-                        if connected_if.receive_packet(packet):
-                            processed_packets.append((packet, connected_if.device.name))
-                            packet_sent = True
-                            # Para switches y hubs, enviar a todas las interfaces
-                            if self.device.device_type in ["switch", "hub"]:
-                                continue
-                            else:
-                                break  # Para routers, enviar solo a una interfaz
-                
-                if not packet_sent:
-                    packet.mark_dropped("No active next hop")
+                packet.add_hop(device_name)
+                alive_append(packet)
+        
+        for packet in alive:
+            # Enviar a todas las interfaces conectadas (broadcast para switches)
+            packet_sent = False
+            for connected_if in neighbors:
+                if connected_if.receive_packet(packet):
+                    append((packet, connected_if.device.name))
+                    packet_sent = True
+                    # Para switches y hubs, enviar a todas las interfaces
+                    if broadcast:
+                        continue
+                    else:
+                        break  # Para routers, enviar solo a una interfaz
+            
+            if not packet_sent:
+                packet.mark_dropped("No active next hop")
         
         return processed_packets
     
-    def process_incoming_packets(self):
+    def process_incoming_packets(self, out_list=None):
         """Procesa paquetes en la cola de entrada"""
-        processed_packets = []
+        processed_packets = out_list if out_list is not None else []
+        queue = self.incoming_queue
+        packets = list(queue)
+        queue.clear()
+        if not packets:
+            return processed_packets
+        self.device._status_dirty = True
         
-        while not self.incoming_queue.is_empty():
-            packet = self.incoming_queue.dequeue()
+        device = self.device
+        ip_int = self.ip_int
+        history = device.message_history
+        append = processed_packets.append
+        
+        for packet in packets:
             if packet:
                 # Si el paquete es para este dispositivo (tiene IP y coincide)
-                if self.ip_address and packet.destination_ip == self.ip_address:
+                if ip_int is not None and packet.destination_ip_int == ip_int:
                     packet.mark_delivered()
-                    self.device.message_history.push(packet)
-                    processed_packets.append(packet)
+                    history.append(packet)
+                    append(packet)
                 else:
                     # Para switches sin IP, o paquetes que no son para este dispositivo, reenviar
                     # Pasar la interfaz de entrada para evitar bucles
-                    self.device.forward_packet_from_interface(packet, self)
+                    device.forward_packet_from_interface(packet, self)
         
         return processed_packets
     
@@ -129,7 +231,7 @@ class Interface:
             'ip_address': self.ip_address,
             'is_up': self.is_up,
             'connected_to': [iface.device.name + ':' + iface.name 
-                           for iface in self.connected_interfaces.to_list()],
+                           for iface in self.connected_interfaces],
             'outgoing_queue_size': len(self.outgoing_queue),
             'incoming_queue_size': len(self.incoming_queue)
         }
@@ -145,14 +247,39 @@ class Device:
             name (str): Nombre del dispositivo
             device_type (str): Tipo de dispositivo (router, switch, host, firewall)
         """
-        self.name = name
-        self.device_type = device_type.lower()
+        self.name = sys.intern(name)
+        self.device_type = sys.intern(device_type.lower())
         self.is_online = True
         self.interfaces = {}  # Diccionario de interfaces por nombre
-        self.message_history = Stack()  # Historial de mensajes recibidos
+        # Historial de mensajes recibidos, acotado para que la memoria
+        # no crezca sin límite en simulaciones largas
+        self.message_history = deque(maxlen=10_000)
         self.packets_sent = 0
         self.packets_received = 0
         self.packets_forwarded = 0
+        # IP de origen memoizada para send: None = desconocida (rescanear),
+        # False = sin interfaz activa. La invalidan los comandos que
+        # modifican interfaces (shutdown / no shutdown / ip address)
+        self._source_ip_cache = None
+        # Índice next-hop: IP de un vecino directo -> interfaz local por
+        # la que se alcanza; lo mantienen connect_to / disconnect_from /
+        # set_ip_address
+        self._neighbor_by_ip = {}
+        # Cachés de las vistas de estado (get_interfaces_status y la
+        # parte de interfaces de to_dict); los mutadores y las colas
+        # marcan _status_dirty y las vistas se reconstruyen perezosamente
+        self._status_dirty = True
+        self._if_status_cache = None
+        self._if_dict_cache = None
+        # Caché LRU de políticas heredadas por IP destino; la clave
+        # incluye _policy_version, que los comandos de policy incrementan,
+        # así las entradas viejas dejan de encontrarse al cambiar políticas
+        self._policy_version = 0
+        self._policy_cache = OrderedDict()
+        # Cuerpo de reenvío especializado por tipo: la rama por paquete
+        # (y su comparación de cadenas) se resuelve una vez acá
+        self._forward_impl = (self._forward_switch if self.device_type is _SWITCH
+                              else self._forward_router)
         
         # Módulo 1: Tabla de rutas AVL
         self.routing_table = AVLTree()
@@ -167,11 +294,13 @@ class Device:
         self.error_log = ErrorLog()
     
     def add_interface(self, interface_name):
-        """Agrega una nueva interfaz al dispositivo"""
+        """Agrega una nueva interfaz al dispositivo y la retorna (None si ya existe)"""
         if interface_name not in self.interfaces:
-            self.interfaces[interface_name] = Interface(interface_name, self)
-            return True
-        return False
+            interface = Interface(interface_name, self)
+            self.interfaces[interface_name] = interface
+            self._status_dirty = True
+            return interface
+        return None
     
     def get_interface(self, interface_name):
         """Obtiene una interfaz por nombre"""
@@ -180,10 +309,17 @@ class Device:
     def set_online(self):
         """Pone el dispositivo en línea"""
         self.is_online = True
+        self._notify_interface_neighbors()
     
     def set_offline(self):
         """Pone el dispositivo fuera de línea"""
         self.is_online = False
+        self._notify_interface_neighbors()
+    
+    def _notify_interface_neighbors(self):
+        """Invalida los vecinos activos cacheados alrededor de este dispositivo"""
+        for interface in self.interfaces.values():
+            interface._notify_neighbors()
     
     def send_packet(self, source_ip, destination_ip, content, ttl=64):
         """Envía un paquete desde este dispositivo"""
@@ -217,56 +353,78 @@ class Device:
         if not self.is_online:
             return False
         
-        # Verificar políticas en el trie primero (Módulo 3)
-        policies = self.prefix_trie.get_inherited_policies(packet.destination_ip)
+        # Los atributos leídos varias veces en el camino caliente se
+        # fijan en locales: cada acceso a atributo es una sonda de dict
+        dst = packet.destination_ip
+        
+        # Verificar políticas en el trie primero (Módulo 3); los flujos
+        # repiten destino, así que la consulta al trie se memoiza
+        cache = self._policy_cache
+        key = (self._policy_version, dst)
+        policies = cache.get(key)
+        if policies is None:
+            policies = self.prefix_trie.get_inherited_policies(dst)
+            cache[key] = policies
+            if len(cache) > 1024:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
         
         # Aplicar política de bloqueo
         if 'block' in policies:
             packet.mark_dropped("Blocked by policy")
-            self.error_log.log_error("PolicyBlock", f"Packet blocked by policy for {packet.destination_ip}")
+            self.error_log.log_error("PolicyBlock", f"Packet blocked by policy for {dst}")
             return False
         
         # Aplicar política de TTL mínimo
-        if 'ttl-min' in policies and packet.ttl < policies['ttl-min']:
+        ttl = packet.ttl
+        if 'ttl-min' in policies and ttl < policies['ttl-min']:
             packet.mark_dropped("TTL below minimum")
-            self.error_log.log_error("PolicyTTL", f"TTL {packet.ttl} below minimum {policies['ttl-min']}")
+            self.error_log.log_error("PolicyTTL", f"TTL {ttl} below minimum {policies['ttl-min']}")
             return False
         
-        if self.device_type == "switch":
-            # Switch: enviar por todas las interfaces excepto la de entrada
-            packet_forwarded = False
-            for interface in self.interfaces.values():
-                if interface != source_interface and interface.is_up and not interface.connected_interfaces.is_empty():
-                    if interface.send_packet(packet):
-                        packet_forwarded = True
-            
-            if packet_forwarded:
-                self.packets_forwarded += 1
-                return True
-        else:
-            # Router: usar tabla AVL para routing (Módulo 1)
-            route = self.routing_table.lookup(packet.destination_ip)
-            if route:
-                # Buscar interfaz conectada al next_hop
-                for interface in self.interfaces.values():
-                    if interface != source_interface and interface.is_up:
-                        # Verificar si algún vecino tiene el next_hop
-                        for connected_if in interface.connected_interfaces.to_list():
-                            if connected_if.ip_address == route.next_hop:
-                                if interface.send_packet(packet):
-                                    self.packets_forwarded += 1
-                                    return True
-            
-            # Si no hay ruta específica, usar comportamiento original
-            for interface in self.interfaces.values():
-                if interface != source_interface and interface.is_up and not interface.connected_interfaces.is_empty():
-                    if interface.send_packet(packet):
-                        self.packets_forwarded += 1
-                        return True
+        # El cuerpo específico del tipo de dispositivo se eligió una sola
+        # vez en el constructor; acá ya no se compara device_type
+        if self._forward_impl(packet, source_interface, dst):
+            return True
         
         # Si no se puede reenviar, descartar
         packet.mark_dropped("No route to destination")
-        self.error_log.log_error("RoutingError", f"No route to {packet.destination_ip}")
+        self.error_log.log_error("RoutingError", f"No route to {dst}")
+        return False
+    
+    def _forward_switch(self, packet, source_interface, dst):
+        """Reenvío de switch: inundar todas las interfaces menos la de entrada"""
+        packet_forwarded = False
+        for interface in self.interfaces.values():
+            if interface != source_interface and interface.is_up and interface.connected_interfaces:
+                if interface.send_packet(packet):
+                    packet_forwarded = True
+        
+        if packet_forwarded:
+            self.packets_forwarded += 1
+            return True
+        return False
+    
+    def _forward_router(self, packet, source_interface, dst):
+        """Reenvío de router: tabla AVL para routing (Módulo 1)"""
+        route = self.routing_table.lookup_lpm(dst)
+        if route:
+            # Resolver la interfaz de salida con una sonda al índice
+            # de vecinos, sin recorrer interfaces x vecinos
+            interface = self._neighbor_by_ip.get(route.next_hop)
+            if interface is not None and interface is not source_interface \
+                    and interface.is_up:
+                if interface.send_packet(packet):
+                    self.packets_forwarded += 1
+                    return True
+        
+        # Si no hay ruta específica, usar comportamiento original
+        for interface in self.interfaces.values():
+            if interface != source_interface and interface.is_up and interface.connected_interfaces:
+                if interface.send_packet(packet):
+                    self.packets_forwarded += 1
+                    return True
         return False
     
     def process_all_interfaces(self):
@@ -279,67 +437,90 @@ class Device:
         if not self.is_online:
             return results
         
+        # Las interfaces agregan directo sobre las listas del resultado;
+        # las colas vacías se detectan aquí con un chequeo de verdad
+        # (deque en C) sin pagar la llamada al método de procesamiento
+        outgoing = results['outgoing']
+        incoming = results['incoming']
         for interface in self.interfaces.values():
             if interface.is_up:
-                outgoing = interface.process_outgoing_packets()
-                incoming = interface.process_incoming_packets()
-                
-                results['outgoing'].extend(outgoing)
-                results['incoming'].extend(incoming)
-                
-                # Actualizar estadísticas
-                self.packets_received += len(incoming)
+                if interface.outgoing_queue:
+                    interface.process_outgoing_packets(outgoing)
+                if interface.incoming_queue:
+                    interface.process_incoming_packets(incoming)
+        
+        # Actualizar estadísticas: cada entrega es un append a incoming,
+        # así que basta el largo final en lugar de un delta por interfaz
+        self.packets_received += len(incoming)
         
         return results
     
     def get_message_history(self):
-        """Retorna el historial de mensajes como lista"""
-        return self.message_history.to_list()
+        """Retorna el historial de mensajes como lista (más reciente primero)"""
+        return list(reversed(self.message_history))
     
     def get_queue_status(self):
         """Retorna el estado de todas las colas del dispositivo"""
         status = {}
         for name, interface in self.interfaces.items():
             status[name] = {
-                'outgoing': interface.outgoing_queue.to_list(),
-                'incoming': interface.incoming_queue.to_list()
+                'outgoing': list(interface.outgoing_queue),
+                'incoming': list(interface.incoming_queue)
             }
         return status
     
+    def _check_status_caches(self):
+        """Descarta las vistas cacheadas si hubo mutaciones desde la última vez"""
+        if self._status_dirty:
+            self._if_status_cache = None
+            self._if_dict_cache = None
+            self._status_dirty = False
+    
     def get_interfaces_status(self):
         """Retorna el estado de todas las interfaces"""
-        return {name: interface.get_status() 
-                for name, interface in self.interfaces.items()}
+        self._check_status_caches()
+        if self._if_status_cache is None:
+            self._if_status_cache = {name: interface.get_status() 
+                                     for name, interface in self.interfaces.items()}
+        return self._if_status_cache
     
     def to_dict(self):
         """Convierte el dispositivo a diccionario para serialización"""
+        # Los contadores cambian en cada tick, así que el dict externo se
+        # arma siempre; sólo la parte de interfaces (estable entre
+        # mutaciones) se cachea
+        self._check_status_caches()
+        if self._if_dict_cache is None:
+            self._if_dict_cache = {name: {
+                'name': iface.name,
+                'ip_address': iface.ip_address,
+                'is_up': iface.is_up
+            } for name, iface in self.interfaces.items()}
         return {
             'name': self.name,
             'device_type': self.device_type,
             'is_online': self.is_online,
-            'interfaces': {name: {
-                'name': iface.name,
-                'ip_address': iface.ip_address,
-                'is_up': iface.is_up
-            } for name, iface in self.interfaces.items()},
+            'interfaces': self._if_dict_cache,
             'packets_sent': self.packets_sent,
             'packets_received': self.packets_received,
             'packets_forwarded': self.packets_forwarded
         }
     
+    # Señala si el directorio de snapshots ya fue creado en este proceso;
+    # evita un makedirs por cada guardado
+    _config_dir_ready = False
+    
     def save_snapshot(self, key):
         """Guarda un snapshot de la configuración (Módulo 2)"""
-        import json
-        import os
-        from datetime import datetime
-        
         # Generar nombre de archivo único
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"snap_{timestamp}.cfg"
-        filepath = os.path.join("configs", filename)
+        filepath = os.path.join(CONFIG_DIR, filename)
         
-        # Crear directorio si no existe
-        os.makedirs("configs", exist_ok=True)
+        # Crear directorio si no existe (una sola vez por proceso)
+        if not Device._config_dir_ready:
+            os.makedirs(CONFIG_DIR, exist_ok=True)
+            Device._config_dir_ready = True
         
         # Preparar datos del snapshot
         snapshot_data = {
@@ -360,8 +541,15 @@ class Device:
             })
         
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(snapshot_data, f, indent=2, ensure_ascii=False)
+            # Serializar completo en memoria y escribir en una sola
+            # llamada, en lugar de volcar incrementalmente con indent;
+            # el índice B-tree se actualiza recién con el archivo escrito
+            if orjson is not None:
+                data = orjson.dumps(snapshot_data, option=orjson.OPT_INDENT_2)
+            else:
+                data = json.dumps(snapshot_data, indent=2, ensure_ascii=False).encode('utf-8')
+            with open(filepath, 'wb') as f:
+                f.write(data)
             
             # Indexar en el B-tree
             self.snapshot_index.insert(key, filename)
@@ -377,14 +565,12 @@ class Device:
             self.error_log.log_error("LoadError", f"Snapshot key '{key}' not found")
             return False, f"Snapshot key '{key}' not found"
         
-        import json
-        import os
-        
-        filepath = os.path.join("configs", filename)
+        filepath = os.path.join(CONFIG_DIR, filename)
         
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                snapshot_data = json.load(f)
+            with open(filepath, 'rb') as f:
+                raw = f.read()
+            snapshot_data = orjson.loads(raw) if orjson is not None else json.loads(raw)
             
             # Restaurar tabla de rutas
             self.routing_table = AVLTree()
@@ -2,9 +2,19 @@
 Clase Network para gestionar la topología de red y orquestar dispositivos
 """
 from device import Device
-from data_structures import LinkedList
+from collections import defaultdict
 import json
 
+# orjson (C + SIMD) serializa bastante más rápido que el json de la
+# stdlib; si no está instalado se usa el camino estándar
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Estados mostrados por list_devices, indexados por is_online
+_STATES = ("offline", "online")
+
 class NetworkStatistics:
     """Estadísticas globales de la red"""
     
@@ -14,7 +24,11 @@ class NetworkStatistics:
         self.total_packets_dropped_ttl = 0
         self.total_packets_dropped_firewall = 0
         self.total_hops = 0
-        self.device_activity = {}  # Actividad por dispositivo
+        self.device_activity = defaultdict(int)  # Actividad por dispositivo
+        # Máximo corriente de actividad, mantenido en O(1) por
+        # actualización para no recorrer el diccionario al reportar
+        self._top_name = None
+        self._top_count = 0
     
     def update_packet_sent(self, device_name):
         """Actualiza estadística de paquete enviado"""
@@ -36,9 +50,11 @@ class NetworkStatistics:
     
     def _update_device_activity(self, device_name):
         """Actualiza la actividad de un dispositivo"""
-        if device_name not in self.device_activity:
-            self.device_activity[device_name] = 0
-        self.device_activity[device_name] += 1
+        count = self.device_activity[device_name] + 1
+        self.device_activity[device_name] = count
+        if count > self._top_count:
+            self._top_count = count
+            self._top_name = device_name
     
     def get_average_hops(self):
         """Calcula el promedio de saltos por paquete entregado"""
@@ -48,11 +64,10 @@ class NetworkStatistics:
     
     def get_top_talker(self):
         """Retorna el dispositivo con más actividad"""
-        if not self.device_activity:
+        if self._top_name is None:
             return None
         
-        top_device = max(self.device_activity.items(), key=lambda x: x[1])
-        return f"{top_device[0]} (processed {top_device[1]} packets)"
+        return f"{self._top_name} (processed {self._top_count} packets)"
 
 class Network:
     """Red que orquesta todos los dispositivos y conexiones"""
@@ -61,13 +76,35 @@ class Network:
         self.devices = {}  # Diccionario de dispositivos por nombre
         self.statistics = NetworkStatistics()
         self.current_device = None  # Dispositivo actual en la consola
+        # Contador monótono que crece con cada mutación de topología;
+        # las cachés derivadas (p. ej. lista de conexiones) lo usan como
+        # clave de invalidación
+        self._topology_version = 0
+        # Índice IP -> dispositivo, reconstruido perezosamente cuando la
+        # versión de topología cambia (los comandos de IP la incrementan).
+        # La búsqueda es por coincidencia exacta, así que un dict gana
+        # siempre; el matching por prefijo más largo ya vive en las
+        # estructuras de data_structures (AVLTree.lookup_lpm y el Trie
+        # comprimido de políticas)
+        self._ip_index = {}
+        self._ip_index_version = -1
+        # Lista de aristas (conexiones) cacheada bajo la misma versión de
+        # topología; se rearma sólo cuando algo conectó o desconectó
+        self._edges = None
+        self._edges_version = -1
+        # Lista contigua de dispositivos en línea para el tick, también
+        # bajo la versión de topología
+        self._online_devices = None
+        self._online_version = -1
     
     def add_device(self, name, device_type="router"):
-        """Agrega un nuevo dispositivo a la red"""
+        """Agrega un nuevo dispositivo a la red y lo retorna (None si ya existe)"""
         if name not in self.devices:
-            self.devices[name] = Device(name, device_type)
-            return True
-        return False
+            device = Device(name, device_type)
+            self.devices[name] = device
+            self._topology_version += 1
+            return device
+        return None
     
     def get_device(self, name):
         """Obtiene un dispositivo por nombre"""
@@ -78,26 +115,33 @@ class Network:
         if name in self.devices:
             device = self.devices[name]
             
-            # Desconectar todas las interfaces
+            # Desconectar todas las interfaces; el caso común (interfaz
+            # sin vecinos) sale sin materializar la lista
             for interface in device.interfaces.values():
-                connected_list = interface.connected_interfaces.to_list()
-                for connected_if in connected_list:
+                connected = interface.connected_interfaces
+                if not connected:
+                    continue
+                for connected_if in list(connected):
                     interface.disconnect_from(connected_if)
             
             del self.devices[name]
+            self._topology_version += 1
             return True
         return False
     
     def connect_devices(self, device1_name, interface1_name, device2_name, interface2_name):
         """Conecta dos interfaces de dispositivos diferentes"""
-        device1 = self.get_device(device1_name)
-        device2 = self.get_device(device2_name)
+        # Una sola dereferencia del diccionario de dispositivos y de cada
+        # tabla de interfaces, sin pasar por los getters intermedios
+        devices = self.devices
+        device1 = devices.get(device1_name)
+        device2 = devices.get(device2_name)
         
         if not device1 or not device2:
             return False
         
-        interface1 = device1.get_interface(interface1_name)
-        interface2 = device2.get_interface(interface2_name)
+        interface1 = device1.interfaces.get(interface1_name)
+        interface2 = device2.interfaces.get(interface2_name)
         
         if not interface1 or not interface2:
             return False
@@ -106,79 +150,108 @@ class Network:
             return False
         
         interface1.connect_to(interface2)
+        self._topology_version += 1
         return True
     
     def disconnect_devices(self, device1_name, interface1_name, device2_name, interface2_name):
         """Desconecta dos interfaces de dispositivos"""
-        device1 = self.get_device(device1_name)
-        device2 = self.get_device(device2_name)
+        devices = self.devices
+        device1 = devices.get(device1_name)
+        device2 = devices.get(device2_name)
         
         if not device1 or not device2:
             return False
         
-        interface1 = device1.get_interface(interface1_name)
-        interface2 = device2.get_interface(interface2_name)
+        interface1 = device1.interfaces.get(interface1_name)
+        interface2 = device2.interfaces.get(interface2_name)
         
         if not interface1 or not interface2:
             return False
         
         interface1.disconnect_from(interface2)
+        self._topology_version += 1
         return True
     
     def set_device_status(self, device_name, status):
         """Cambia el estado online/offline de un dispositivo"""
-        device = self.get_device(device_name)
+        device = self.devices.get(device_name)
         if not device:
             return False
         
-        if status.lower() == "online":
+        # Una sola normalización del argumento en vez de un .lower() por
+        # comparación
+        status = status.lower()
+        if status == "online":
             device.set_online()
-            return True
-        elif status.lower() == "offline":
+        elif status == "offline":
             device.set_offline()
-            return True
-        return False
+        else:
+            return False
+        self._topology_version += 1
+        return True
     
     def list_devices(self):
         """Lista todos los dispositivos en la red"""
-        device_list = []
-        for device in self.devices.values():
-            status = "online" if device.is_online else "offline"
-            device_list.append(f"- {device.name} ({status})")
-        return device_list
+        return [f"- {device.name} ({_STATES[device.is_online]})"
+                for device in self.devices.values()]
+    
+    def list_devices_str(self):
+        """Lista de dispositivos ya unida en un solo string"""
+        return "\n".join(f"- {device.name} ({_STATES[device.is_online]})"
+                          for device in self.devices.values())
     
     def tick(self):
         """Avanza un paso de simulación procesando todas las colas"""
         tick_results = []
+        # Instantánea de los dispositivos en línea: una lista contigua en
+        # vez de filtrar la vista del diccionario en cada tick
+        if self._online_version != self._topology_version:
+            self._online_devices = [d for d in self.devices.values() if d.is_online]
+            self._online_version = self._topology_version
         
-        for device in self.devices.values():
-            if device.is_online:
-                results = device.process_all_interfaces()
-                
-                # Procesar resultados salientes
-                for packet, destination in results['outgoing']:
-                    tick_results.append(f"[Tick] {device.name} → {destination}: packet forwarded (TTL={packet.ttl})")
-                    
-                    if packet.dropped:
-                        self.statistics.update_packet_dropped_ttl()
-                    else:
-                        self.statistics._update_device_activity(device.name)
+        # Métodos de estadísticas y append ligados una vez; los bucles
+        # internos corren por paquete y cada lookup repetido suma
+        append = tick_results.append
+        stats = self.statistics
+        update_dropped_ttl = stats.update_packet_dropped_ttl
+        update_delivered = stats.update_packet_delivered
+        update_activity = stats._update_device_activity
+        
+        for device in self._online_devices:
+            device_name = device.name
+            results = device.process_all_interfaces()
+            
+            # Procesar resultados salientes
+            for packet, destination in results['outgoing']:
+                append(f"[Tick] {device_name} → {destination}: packet forwarded (TTL={packet.ttl})")
                 
-                # Procesar paquetes entregados
-                for packet in results['incoming']:
-                    if packet.delivered:
-                        tick_results.append(f"[Tick] {device.name}: packet delivered from {packet.source_ip}")
-                        self.statistics.update_packet_delivered(packet.get_hops_count())
+                if packet.dropped:
+                    update_dropped_ttl()
+                else:
+                    update_activity(device_name)
+            
+            # Procesar paquetes entregados
+            for packet in results['incoming']:
+                if packet.delivered:
+                    append(f"[Tick] {device_name}: packet delivered from {packet.source_ip}")
+                    update_delivered(packet.get_hops_count())
         
         return tick_results
     
     def find_device_by_ip(self, ip_address):
         """Encuentra un dispositivo por su dirección IP"""
-        for device in self.devices.values():
-            for interface in device.interfaces.values():
-                if interface.ip_address == ip_address:
-                    return device
-        return None
+        if self._ip_index_version != self._topology_version:
+            # Reconstruir el índice una vez por cambio de topología; las
+            # búsquedas siguientes son un acceso de diccionario O(1)
+            index = {}
+            for device in self.devices.values():
+                for interface in device.interfaces.values():
+                    ip = interface.ip_address
+                    if ip is not None and ip not in index:
+                        index[ip] = device
+            self._ip_index = index
+            self._ip_index_version = self._topology_version
+        return self._ip_index.get(ip_address)
     
     def get_network_statistics(self):
         """Retorna las estadísticas globales de la red"""
@@ -191,8 +264,14 @@ class Network:
             'top_talker': self.statistics.get_top_talker()
         }
     
-    def save_configuration(self, filename="running-config.json"):
-        """Guarda la configuración de la red en formato JSON"""
+    def save_configuration(self, filename="running-config.json", pretty=False):
+        """Guarda la configuración de la red en formato JSON
+
+        Por defecto escribe compacto (separators sin espacios y sin
+        indent): el formateador con sangría de json duplica el trabajo y
+        la memoria pico en redes grandes. pretty=True recupera la salida
+        legible de antes.
+        """
         config = {
             'devices': {name: device.to_dict() for name, device in self.devices.items()},
             'connections': self._get_all_connections(),
@@ -200,8 +279,16 @@ class Network:
         }
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
+            if orjson is not None:
+                data = orjson.dumps(config, option=orjson.OPT_INDENT_2 if pretty else 0)
+                with open(filename, 'wb') as f:
+                    f.write(data)
+            else:
+                with open(filename, 'w', encoding='utf-8') as f:
+                    if pretty:
+                        json.dump(config, f, indent=2, ensure_ascii=False)
+                    else:
+                        json.dump(config, f, separators=(',', ':'), ensure_ascii=False)
             return True
         except Exception as e:
             print(f"Error saving configuration: {e}")
@@ -209,16 +296,19 @@ class Network:
     
     def _get_all_connections(self):
         """Obtiene todas las conexiones de la red"""
+        if self._edges_version == self._topology_version:
+            return self._edges
+        
         connections = []
         processed_pairs = set()
         
         for device_name, device in self.devices.items():
             for interface_name, interface in device.interfaces.items():
-                for connected_if in interface.connected_interfaces.to_list():
-                    pair = tuple(sorted([
-                        f"{device_name}:{interface_name}",
-                        f"{connected_if.device.name}:{connected_if.name}"
-                    ]))
+                for connected_if in interface.connected_interfaces:
+                    # frozenset canónico sin armar cadenas ni ordenar:
+                    # hash directo sobre las tuplas de identidad
+                    pair = frozenset(((device_name, interface_name),
+                                      (connected_if.device.name, connected_if.name)))
                     
                     if pair not in processed_pairs:
                         connections.append({
@@ -229,16 +319,22 @@ class Network:
                         })
                         processed_pairs.add(pair)
         
+        self._edges = connections
+        self._edges_version = self._topology_version
         return connections
     
     def load_configuration(self, filename):
         """Carga una configuración desde un archivo JSON"""
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                config = json.load(f)
+            with open(filename, 'rb') as f:
+                raw = f.read()
+            config = orjson.loads(raw) if orjson is not None else json.loads(raw)
             
-            # Limpiar red actual
+            # Limpiar red actual; el bump de versión invalida las vistas
+            # derivadas (índice de IPs, dispositivos en línea, aristas)
+            # que si no seguirían sirviendo los objetos eliminados
             self.devices.clear()
+            self._topology_version += 1
             self.statistics = NetworkStatistics()
             
             # Recrear dispositivos
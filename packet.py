@@ -2,10 +2,13 @@
 Clase Packet para representar paquetes de red con TTL y trazado de ruta
 """
 import uuid
-from data_structures import LinkedList
+from data_structures import ip_to_int
 
 class Packet:
     """Paquete de red virtual con origen, destino, contenido y TTL"""
+    __slots__ = ('id', 'source_ip', 'destination_ip', 'destination_ip_int', 'source_ip_int',
+                 'content', 'ttl', 'original_ttl', 'route_trace',
+                 'delivered', 'dropped', 'drop_reason', '_route_trace_str')
     
     def __init__(self, source_ip, destination_ip, content, ttl=64):
         """
@@ -17,16 +20,32 @@ class Packet:
             content (str): Contenido del mensaje
             ttl (int): Time To Live inicial
         """
-        self.id = str(uuid.uuid4())[:8]  # Identificador único corto
+        # .hex evita el formateo canónico con guiones que luego se recorta
+        self.id = uuid.uuid4().hex[:8]  # Identificador único corto
         self.source_ip = source_ip
         self.destination_ip = destination_ip
+        # Formas empaquetadas (uint32) de ambas IPs: las comparaciones
+        # por salto son entre enteros en vez de cadenas (None si la IP
+        # no es bien formada). Las cadenas se conservan para las APIs y
+        # vistas que trabajan con notación punteada
+        try:
+            self.destination_ip_int = ip_to_int(destination_ip)
+        except OSError:
+            self.destination_ip_int = None
+        try:
+            self.source_ip_int = ip_to_int(source_ip)
+        except OSError:
+            self.source_ip_int = None
         self.content = content
         self.ttl = ttl
         self.original_ttl = ttl
-        self.route_trace = LinkedList()  # Traza de la ruta seguida
+        self.route_trace = []  # Traza de la ruta seguida
         self.delivered = False
         self.dropped = False
         self.drop_reason = None
+        # Traza formateada, memoizada cuando el paquete llegó a un
+        # estado terminal (la ruta ya no cambia)
+        self._route_trace_str = None
     
     def add_hop(self, device_name):
         """Agrega un dispositivo a la traza de ruta"""
@@ -34,33 +53,48 @@ class Packet:
     
     def decrement_ttl(self):
         """Decrementa el TTL en 1 y retorna True si aún es válido"""
-        self.ttl -= 1
-        if self.ttl <= 0:
+        ttl = self.ttl - 1
+        self.ttl = ttl
+        if ttl <= 0:
             self.dropped = True
             self.drop_reason = "TTL expired"
+            self._route_trace_str = None
             return False
         return True
     
     def get_route_trace_string(self):
         """Retorna la traza de ruta como string"""
-        hops = self.route_trace.to_list()
-        return " → ".join(hops) if hops else "No hops recorded"
+        cached = self._route_trace_str
+        if cached is not None:
+            return cached
+        hops = self.route_trace
+        result = " → ".join(hops) if hops else "No hops recorded"
+        if self.delivered or self.dropped:
+            self._route_trace_str = result
+        return result
     
     def mark_delivered(self):
         """Marca el paquete como entregado exitosamente"""
         self.delivered = True
+        self._route_trace_str = None
     
     def mark_dropped(self, reason):
         """Marca el paquete como descartado con una razón"""
         self.dropped = True
         self.drop_reason = reason
+        self._route_trace_str = None
     
     def get_hops_count(self):
         """Retorna el número de saltos realizados"""
         return len(self.route_trace)
     
-    def to_dict(self):
-        """Convierte el paquete a diccionario para serialización"""
+    def to_dict(self, copy=True):
+        """Convierte el paquete a diccionario para serialización
+
+        Con copy=False la traza se comparte sin copiar, para llamadores
+        que serializan el dict de inmediato y no lo retienen.
+        """
+        route_trace = self.route_trace
         return {
             'id': self.id,
             'source_ip': self.source_ip,
@@ -68,7 +102,7 @@ class Packet:
             'content': self.content,
             'ttl': self.ttl,
             'original_ttl': self.original_ttl,
-            'route_trace': self.route_trace.to_list(),
+            'route_trace': list(route_trace) if copy else route_trace,
             'delivered': self.delivered,
             'dropped': self.dropped,
             'drop_reason': self.drop_reason